@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Session, Photo
+from .models import Session, Photo, Order, OrderItem
 from .forms import SessionAdminForm
 
 # Inline do zarządzania pojedyńczymi zdjęciami na stronie edycji Session.
@@ -32,4 +32,21 @@ class SessionAdmin(admin.ModelAdmin):
             session.regenerate_password()
         self.message_user(request, f'Wygenerowano nowe hasła dla {queryset.count()} sesji.')
 
-admin.site.register(Session, SessionAdmin)
\ No newline at end of file
+admin.site.register(Session, SessionAdmin)
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    readonly_fields = ('photo', 'session', 'price')
+    can_delete = False
+
+
+class OrderAdmin(admin.ModelAdmin):
+    inlines = [OrderItemInline]
+    list_display = ('id', 'status', 'email', 'total', 'created_at', 'fulfilled_at')
+    list_filter = ('status',)
+    search_fields = ('stripe_session_id', 'email')
+    readonly_fields = ('stripe_session_id', 'token', 'zip_file', 'email_sent', 'paid_at', 'fulfilled_at')
+
+admin.site.register(Order, OrderAdmin)
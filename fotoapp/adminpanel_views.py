@@ -1,3 +1,5 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db.models import Q
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -5,6 +7,12 @@ from django.contrib.auth import authenticate, login, logout
 from django.http import HttpResponseBadRequest, JsonResponse
 from .models.session import Session
 from .models.photo import Photo
+from django.urls import reverse
+from .renditions import PREVIEW
+from .tokens import photo_token
+
+SESSIONS_PER_PAGE = 24
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
 
 def panel_login(request):
     if request.user.is_authenticated:
@@ -35,10 +43,59 @@ def dashboard(request):
     return redirect('panel_sessions')
 
 # --- SESJE ---
+def _encode_cursor(session):
+    # Pozycja ostatniej sesji na stronie: mikrosekundy od epoki i id (rozstrzyga remisy)
+    micros = (session.created_at - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros}.{session.pk}"
+
+
+def _decode_cursor(cursor):
+    try:
+        micros, pk = cursor.split(".")
+        return _EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (ValueError, OverflowError):
+        return None
+
+
 @login_required
 def session_list(request):
-    sessions = Session.objects.all().order_by("-created_at")
-    return render(request, "adminpanel/session_list.html", {"sessions": sessions})
+    """
+    Stronicowanie po kluczu (created_at, id) zamiast OFFSET - każda strona to odczyt
+    SESSIONS_PER_PAGE wierszy z indeksu session_created_idx, niezależnie od liczby sesji.
+    Wyszukiwanie po początku nazwy korzysta z indeksu session_name_idx; dopiero gdy żadna
+    nazwa tak się nie zaczyna, szukamy fragmentu w środku (pełny skan, jak dawniej).
+    """
+    # Statystyki i okładka w jednym zapytaniu (JOIN po kluczach głównych)
+    sessions = Session.objects.select_related("stats", "cover_photo").order_by("-created_at", "-id")
+
+    q = request.GET.get("q", "").strip()
+    if q:
+        prefix = sessions.filter(name__istartswith=q)
+        sessions = prefix if prefix.exists() else sessions.filter(name__icontains=q)
+
+    cursor = _decode_cursor(request.GET.get("cursor", ""))
+    if cursor:
+        created_at, pk = cursor
+        sessions = sessions.filter(Q(created_at__lt=created_at) | Q(id__lt=pk), created_at__lte=created_at)
+
+    # Jeden wiersz więcej mówi, czy istnieje następna strona - bez COUNT(*)
+    sessions = list(sessions[:SESSIONS_PER_PAGE + 1])
+    next_cursor = _encode_cursor(sessions[SESSIONS_PER_PAGE - 1]) if len(sessions) > SESSIONS_PER_PAGE else None
+    sessions = sessions[:SESSIONS_PER_PAGE]
+    for s in sessions:
+        # Okładka jako podgląd z manifestu (bez dotykania dysku); bez wpisu - podpisany URL
+        # obsługiwany przez pulę renderującą. Nigdy pełny oryginał.
+        if s.cover_photo:
+            s.cover_url = s.cover_photo.rendition_url(PREVIEW) or reverse(
+                "serve_encrypted_image", args=[photo_token(s.cover_photo, PREVIEW)]
+            )
+
+    return render(request, "adminpanel/session_list.html", {
+        "sessions": sessions,
+        "q": q,
+        "next_cursor": next_cursor,
+        "is_first_page": cursor is None,
+    })
 
 @login_required
 def session_form(request, id=None):
@@ -74,7 +131,7 @@ def session_form(request, id=None):
             return redirect('panel_session_edit', id=session.id)
 
     # Pobieranie istniejących zdjęć tylko jeśli sesja istnieje
-    photos = session.photos.all() if session else []
+    photos = session.photos.by_capture_time() if session else []
 
     return render(request, "adminpanel/session_form.html", {
         "session": session,
@@ -103,7 +160,7 @@ def session_photos_upload(request, id):
             return HttpResponseBadRequest("Nie przesłano plików")
         for f in files:
             Photo.objects.create(session=session, image=f)
-        photos = session.photos.all().order_by("-id")
+        photos = session.photos.by_capture_time()
         return render(request, "adminpanel/partials/photo_grid.html", {"photos": photos})
     return HttpResponseBadRequest("Invalid request")
 
@@ -120,6 +177,8 @@ def session_set_price_all(request, session_id):
             return JsonResponse({"error": "Invalid price"}, status=400)
 
         Photo.objects.filter(session=session).update(price=price_val)
+        # update() omija sygnały - wersję podbijamy ręcznie
+        session.bump_content_version()
 
         return JsonResponse({"success": True, "price": price_val})
 
@@ -131,7 +190,8 @@ def set_cover_photo(request, photo_id):
     session = photo.session
     session.cover_photo = photo
     session.save()
-    photos = session.photos.all()
+    session.bump_content_version()
+    photos = session.photos.by_capture_time()
     html = render(request, "adminpanel/partials/photo_grid.html", {"photos": photos}).content.decode('utf-8')
     return JsonResponse({"html": html})
 
@@ -140,7 +200,7 @@ def photo_delete(request, photo_id):
     photo = get_object_or_404(Photo, id=photo_id)
     session = photo.session
     photo.delete()
-    photos = session.photos.all()
+    photos = session.photos.by_capture_time()
     html = render(request, "adminpanel/partials/photo_grid.html", {"photos": photos}).content.decode('utf-8')
     return JsonResponse({"html": html})
 
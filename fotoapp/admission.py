@@ -0,0 +1,105 @@
+# fotoapp/admission.py
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+
+
+class Saturated(Exception):
+    """Pula renderowania i kolejka są pełne - żądanie należy odrzucić (503)."""
+
+
+def _init_worker():
+    # Procesy puli startują metodą "spawn" (bez kopiowania wątków serwera),
+    # więc każdy konfiguruje Django od nowa.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kilar_fotografia.settings')
+    import django
+    django.setup()
+
+
+def render_rendition(image_name, rendition, image_format):
+    """Zadanie wykonywane w procesie puli: renderuje wersję pochodną do cache na dysku."""
+    from .renditions import ensure_rendition
+    return ensure_rendition(image_name, rendition, image_format)
+
+
+class AdmissionController:
+    """
+    Ogranicza pracę CPU (Pillow) do stałej puli procesów: najwyżej `workers` zadań
+    wykonuje się naraz, a najwyżej `queue` czeka. Kolejne żądania dostają od razu
+    Saturated zamiast blokować wątki serwera obsługujące koszyk i płatności.
+    """
+
+    def __init__(self, workers, queue):
+        self.workers = workers
+        self.capacity = max(workers, 1) + queue
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self):
+        # workers=0 - renderowanie w wątkach (np. w testach i przy runserver)
+        if self._executor is None and self.workers:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                    )
+        return self._executor
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                return False
+            self._in_flight += 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _discard(self, executor):
+        with self._lock:
+            # Pulę mogło już podmienić inne żądanie z tej samej awarii
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn, *args):
+        if not self._acquire():
+            raise Saturated()
+        try:
+            if self.workers:
+                executor = self.executor
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+                except BrokenProcessPool:
+                    # Proces puli zginął (np. OOM przy ogromnym zdjęciu) - następne żądanie tworzy nową pulę
+                    self._discard(executor)
+                    raise
+            return await asyncio.to_thread(fn, *args)
+        finally:
+            self._release()
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(settings.IMAGE_RENDER_WORKERS, settings.IMAGE_RENDER_QUEUE)
+    return _controller
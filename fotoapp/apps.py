@@ -1,6 +1,25 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def set_journal_mode(using, **kwargs):
+    # Tryb WAL zostaje w pliku bazy - wystarczy ustawić go raz, po migracji
+    from django.conf import settings
+    from django.db import connections
+
+    connection = connections[using]
+    if connection.vendor == "sqlite" and settings.SQLITE_JOURNAL_MODE:
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
 
 
 class FotoappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fotoapp'
+
+    def ready(self):
+        from django.conf import settings
+        post_migrate.connect(set_journal_mode, sender=self)
+        if settings.DERIVED_FILE_JANITOR_INTERVAL:
+            from . import janitor
+            janitor.start_periodic(settings.DERIVED_FILE_JANITOR_INTERVAL)
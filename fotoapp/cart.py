@@ -6,6 +6,16 @@ CART_SESSION_KEY = "cart"
 def _cart(request):
     return request.session.setdefault(CART_SESSION_KEY, {})
 
+# Odczyt koszyka bez modyfikowania sesji - setdefault() na pustej sesji oznacza ją
+# jako zmienioną i wymusza zapis do django_session nawet przy samym podglądzie.
+def peek(request):
+    return request.session.get(CART_SESSION_KEY, {})
+
+# Widoki asynchroniczne muszą wczytać sesję z bazy przed użyciem funkcji poniżej -
+# później request.session korzysta już z wczytanych danych, bez zapytań.
+async def load(request):
+    await request.session.aget(CART_SESSION_KEY)
+
 def add(request, photo_id, price, qty=1):
     cart = _cart(request)
     key = str(photo_id)
@@ -37,4 +47,4 @@ def set_qty(request, photo_id, qty, price):
     return cart
 
 def count(request):
-    return sum(i["qty"] for i in _cart(request).values())
+    return sum(i["qty"] for i in peek(request).values())
@@ -0,0 +1,175 @@
+# fotoapp/cleanup.py
+import os
+import threading
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from .locks import single_flight
+from .storage import original_lock_key
+
+# Ile razy ponawiamy usunięcie pliku, zanim wpis zostanie pominięty przez sweeper.
+MAX_ATTEMPTS = 5
+
+_sweeper_lock = threading.Lock()
+_sweeper_thread = None
+
+
+def photo_file_entries(image, watermarked_image):
+    """
+    Wpisy (ścieżka, właściciel) dla plików jednego zdjęcia. Wersje pochodne nie mają
+    własnych wpisów - sweeper wyznacza ich nazwy ze ścieżki oryginału (_remove_renditions).
+    """
+    if not image:
+        return []
+    entries = [(image, image)]
+    if watermarked_image:
+        entries.append((watermarked_image, image))
+    return entries
+
+
+def journal(entries=(), directories=()):
+    """Dopisuje pliki i katalogi do dziennika jednym zapytaniem."""
+    from .models import FileCleanup
+
+    rows = [FileCleanup(path=path, owner=owner) for path, owner in dict.fromkeys(entries)]
+    rows += [FileCleanup(path=path, is_directory=True) for path in dict.fromkeys(directories)]
+    if rows:
+        FileCleanup.objects.bulk_create(rows, batch_size=500)
+
+
+def _prune_empty_dirs(directory):
+    """Usuwa puste katalogi od podanego w górę, nie wychodząc poza MEDIA_ROOT."""
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    directory = os.path.abspath(directory)
+    while directory.startswith(media_root + os.sep):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
+
+
+def _remove_directory_tree(directory):
+    """Usuwa puste podkatalogi (od najgłębszych). Pliki innych sesji zostają nietknięte."""
+    if not os.path.isdir(directory):
+        return
+    for root, dirs, files in os.walk(directory, topdown=False):
+        if not files and not os.listdir(root):
+            os.rmdir(root)
+    _prune_empty_dirs(os.path.dirname(directory))
+
+
+def _remove_original(row):
+    """
+    Usuwa oryginał pod blokadą wspólną z ContentAddressedStorage._save. Upload tej samej
+    zawartości mógł przejąć plik po zapytaniu o właścicieli - wtedy plik zostaje i zwracamy False.
+    """
+    from .models import Photo
+
+    full_path = os.path.join(settings.MEDIA_ROOT, row.path)
+    with single_flight(original_lock_key(row.path)):
+        try:
+            if os.stat(full_path).st_mtime >= row.created_at.timestamp():
+                return False
+        except FileNotFoundError:
+            # Poprzednia próba usunęła już oryginał - zostały najwyżej wersje pochodne
+            return True
+        if Photo.objects.filter(image=row.path).exists():
+            return False
+        os.remove(full_path)
+        return True
+
+
+def _remove_renditions(image_name):
+    """Usuwa wszystkie możliwe wersje pochodne oryginału (z manifestu i tworzone leniwie)."""
+    from .renditions import all_rendition_names
+
+    for name in all_rendition_names(image_name):
+        full_path = os.path.join(settings.MEDIA_ROOT, name)
+        try:
+            os.remove(full_path)
+        except FileNotFoundError:
+            continue
+        _prune_empty_dirs(os.path.dirname(full_path))
+
+
+def sweep(batch_size=None):
+    """
+    Przetwarza jedną partię dziennika. Zwraca liczbę obsłużonych wpisów (0 = dziennik pusty).
+    Pliki wciąż używane przez inne zdjęcie (ten sam oryginał) są pomijane.
+    """
+    from .models import FileCleanup, Photo
+
+    batch_size = batch_size or settings.FILE_CLEANUP_BATCH_SIZE
+    batch = list(FileCleanup.objects.filter(attempts__lt=MAX_ATTEMPTS).order_by("id")[:batch_size])
+    if not batch:
+        return 0
+
+    owners = {row.owner for row in batch if row.owner}
+    still_used = set(Photo.objects.filter(image__in=owners).values_list("image", flat=True))
+
+    done, failed = [], []
+    for row in batch:
+        full_path = os.path.join(settings.MEDIA_ROOT, row.path)
+        try:
+            if row.is_directory:
+                _remove_directory_tree(full_path)
+            elif row.owner not in still_used:
+                if row.path == row.owner:
+                    if _remove_original(row):
+                        _remove_renditions(row.path)
+                else:
+                    try:
+                        os.remove(full_path)
+                    except FileNotFoundError:
+                        pass
+                _prune_empty_dirs(os.path.dirname(full_path))
+            done.append(row.pk)
+        except OSError as e:
+            row.attempts += 1
+            row.last_error = str(e)
+            failed.append(row)
+
+    FileCleanup.objects.filter(pk__in=done).delete()
+    if failed:
+        FileCleanup.objects.bulk_update(failed, ["attempts", "last_error"])
+    return len(batch)
+
+
+def sweep_all(batch_size=None):
+    total = 0
+    while True:
+        processed = sweep(batch_size)
+        if not processed:
+            return total
+        total += processed
+
+
+def _run_sweeper():
+    global _sweeper_thread
+    try:
+        sweep_all()
+    except Exception as e:
+        print(f"Błąd sprzątania plików: {e}")
+    finally:
+        close_old_connections()
+        with _sweeper_lock:
+            _sweeper_thread = None
+
+
+def schedule_sweep():
+    """
+    Uruchamia sweeper w wątku w tle po zatwierdzeniu bieżącej transakcji.
+    Najwyżej jeden wątek naraz; bez trybu w tle pliki sprząta komenda sweep_files.
+    """
+    if not settings.FILE_CLEANUP_IN_BACKGROUND:
+        return
+
+    def start():
+        global _sweeper_thread
+        with _sweeper_lock:
+            if _sweeper_thread is not None:
+                return
+            _sweeper_thread = threading.Thread(target=_run_sweeper, name="file-cleanup", daemon=True)
+            _sweeper_thread.start()
+
+    transaction.on_commit(start)
@@ -1,12 +1,17 @@
 # fotoapp/context_processors.py
+from django.utils.functional import SimpleLazyObject
 from .cart import count
 
 def cart_count(request):
     """
     Zwraca zmienną 'cart_count' z liczbą elementów w koszyku,
     dostępną globalnie w każdym szablonie.
+    Wartość jest leniwa - sesja jest wczytywana tylko w szablonach, które jej używają.
     """
-    try:
-        return {"cart_count": count(request)}
-    except Exception:
-        return {"cart_count": 0}
+    def _count():
+        try:
+            return count(request)
+        except Exception:
+            return 0
+
+    return {"cart_count": SimpleLazyObject(_count)}
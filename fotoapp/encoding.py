@@ -0,0 +1,82 @@
+# fotoapp/encoding.py
+import io
+import os
+from django.conf import settings
+
+# Wartości domyślne dla pól profilu, których nie podano w settings.IMAGE_ENCODING_PROFILES.
+PROFILE_DEFAULTS = {
+    "format": None,          # None = format z rozszerzenia pliku (albo formatu obrazu źródłowego)
+    "quality": 85,
+    "progressive": False,    # JPEG: kodowanie progresywne
+    "optimize": False,       # JPEG: zoptymalizowane tablice Huffmana, PNG: mocniejsza kompresja
+    "subsampling": None,     # JPEG: "4:4:4", "4:2:2" lub "4:2:0"; None = domyślne Pillow
+    "method": 4,             # WebP: kompromis szybkość/rozmiar (0-6)
+    "speed": 6,              # AVIF: kompromis szybkość/rozmiar (0-10)
+    "strip_metadata": True,  # False = przepisuje EXIF i profil ICC z oryginału
+}
+
+def get_profile(name):
+    """Zwraca profil kodowania z settings uzupełniony wartościami domyślnymi."""
+    try:
+        profile = settings.IMAGE_ENCODING_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Nieznany profil kodowania: {name}")
+    return {**PROFILE_DEFAULTS, **profile}
+
+
+def resolve_format(image, fp, profile, default=None):
+    """
+    Format zapisu: z profilu, a bez niego z rozszerzenia ścieżki, podanego domyślnego
+    albo formatu obrazu źródłowego.
+    """
+    if profile["format"]:
+        return profile["format"].upper()
+    if isinstance(fp, (str, os.PathLike)):
+        from PIL import Image
+
+        image_format = Image.registered_extensions().get(os.path.splitext(fp)[1].lower())
+        if image_format:
+            return image_format
+    return default or image.format
+
+
+def save_options(image, profile, image_format=None):
+    """Tłumaczy profil na parametry Image.save() dla danego formatu."""
+    image_format = (image_format or profile["format"] or image.format or "").upper()
+    options = {"quality": profile["quality"]}
+
+    if image_format == "JPEG":
+        options["progressive"] = profile["progressive"]
+        options["optimize"] = profile["optimize"]
+        if profile["subsampling"]:
+            options["subsampling"] = profile["subsampling"]
+    elif image_format == "WEBP":
+        options["method"] = profile["method"]
+    elif image_format == "AVIF":
+        options["speed"] = profile["speed"]
+    elif profile["optimize"]:
+        options["optimize"] = True
+
+    if not profile["strip_metadata"]:
+        for key in ("exif", "icc_profile"):
+            if image.info.get(key):
+                options[key] = image.info[key]
+    return options
+
+
+def save(image, fp, profile_name, default_format=None):
+    """
+    Zapisuje obraz do pliku (ścieżka lub obiekt plikowy) według nazwanego profilu.
+    default_format - format dla profilu bez formatu, gdy nie wynika on ze ścieżki.
+    """
+    profile = get_profile(profile_name)
+    # Opcje formatu (np. subsampling JPEG) zależą od formatu także wtedy, gdy profil go nie podaje
+    image_format = resolve_format(image, fp, profile, default_format)
+    image.save(fp, format=image_format, **save_options(image, profile, image_format))
+
+
+def encode(image, profile_name, default_format=None):
+    """Koduje obraz według profilu i zwraca bajty."""
+    buffer = io.BytesIO()
+    save(image, buffer, profile_name, default_format)
+    return buffer.getvalue()
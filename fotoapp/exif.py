@@ -0,0 +1,69 @@
+# fotoapp/exif.py
+from datetime import datetime
+from django.utils import timezone
+
+# Identyfikatory tagów EXIF
+TAG_MAKE = 271
+TAG_MODEL = 272
+TAG_ORIENTATION = 274
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME = 306
+TAG_DATETIME_ORIGINAL = 36867
+TAG_LENS_MODEL = 42036
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        value = value.decode(errors="ignore")
+    return str(value or "").strip("\x00 ")[:100]
+
+
+def _parse_datetime(value):
+    try:
+        parsed = datetime.strptime(_text(value), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    return timezone.make_aware(parsed)
+
+
+def read_metadata(image_file):
+    """
+    Odczytuje wymiary i podstawowe dane EXIF. Image.open czyta tylko nagłówek,
+    więc pikseli nie dekodujemy.
+    """
+    from PIL import Image
+
+    with Image.open(image_file) as img:
+        width, height = img.size
+        exif = img.getexif()
+        exif_ifd = exif.get_ifd(TAG_EXIF_IFD)
+
+    taken = exif_ifd.get(TAG_DATETIME_ORIGINAL) or exif.get(TAG_DATETIME)
+    try:
+        orientation = int(exif.get(TAG_ORIENTATION, 1))
+    except (TypeError, ValueError):
+        orientation = 1
+
+    return {
+        "width": width,
+        "height": height,
+        "orientation": orientation if 1 <= orientation <= 8 else 1,
+        "taken_at": _parse_datetime(taken) if taken else None,
+        "camera_make": _text(exif.get(TAG_MAKE)),
+        "camera_model": _text(exif.get(TAG_MODEL)),
+        "lens_model": _text(exif_ifd.get(TAG_LENS_MODEL)),
+    }
+
+
+def store_metadata(photo):
+    """Zapisuje (lub nadpisuje) metadane zdjęcia w tabeli PhotoMetadata."""
+    from .models import PhotoMetadata
+
+    photo.image.open("rb")
+    try:
+        values = read_metadata(photo.image)
+    finally:
+        photo.image.close()
+    values["file_size"] = photo.image.size
+    metadata, _ = PhotoMetadata.objects.update_or_create(photo=photo, defaults=values)
+    return metadata
@@ -0,0 +1,278 @@
+# fotoapp/janitor.py
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Sum
+from django.utils import timezone
+from .cleanup import _prune_empty_dirs
+from .locks import single_flight
+from .orders import ZIPS_ROOT
+from .renditions import PREVIEW
+from .sprites import SPRITES_ROOT, sheet_names
+from .storage import ORIGINALS_ROOT, RENDITIONS_ROOT
+
+# Klasy plików pochodnych i ich katalogi (względem MEDIA_ROOT). Wszystkie da się odtworzyć:
+# miniatury renderuje serve_encrypted_image, archiwa - strona sukcesu, arkusze miniatur -
+# galeria (w tle).
+CLASS_ROOTS = {
+    "renditions": RENDITIONS_ROOT,
+    "zips": ZIPS_ROOT,
+    "watermarked": "watermarked",
+    "sprites": SPRITES_ROOT,
+}
+
+# Wersje opisane w manifeście zdjęcia nie podlegają ewikcji: ich usunięcie oznaczałoby
+# przebudowę manifestu i nową wersję sesji, czyli ponowne renderowanie całej galerii.
+# Janitor zwalnia tylko wersje tworzone leniwie, odtwarzane przy następnym żądaniu.
+MANIFEST_RENDITIONS = {PREVIEW}
+
+BATCH_SIZE = 500
+
+_periodic_thread = None
+
+
+def _chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _is_derived(kind, name):
+    """
+    Zabezpieczenie: janitor usuwa tylko pliki z katalogu swojej klasy, nigdy oryginały
+    ani wersje z manifestu.
+    """
+    name = os.path.normpath(name).replace(os.sep, "/")
+    if kind == "renditions" and _is_manifest_rendition(name):
+        return False
+    return name.startswith(CLASS_ROOTS[kind] + "/") and not name.startswith(ORIGINALS_ROOT + "/")
+
+
+def _rendition_digest(name):
+    # renditions/ab/cd/<sha256 ścieżki oryginału>_<wersja>.<rozszerzenie>
+    return os.path.basename(name).split("_", 1)[0]
+
+
+def _is_manifest_rendition(name):
+    return os.path.basename(name).partition("_")[2].rsplit(".", 1)[0] in MANIFEST_RENDITIONS
+
+
+def _sprite_session(name):
+    # sprites/<id sesji>/<wersja>-<nr arkusza>.jpg
+    return name.split("/")[1]
+
+
+# ==========================================
+# ZAPIS UŻYCIA
+# ==========================================
+
+def record_access(paths=(), session_id=None):
+    """
+    Zapisuje czas użycia plików (lub wszystkich wersji pochodnych sesji). Dokładność to
+    DERIVED_FILE_ACCESS_RESOLUTION - w tym oknie kolejne odsłony nie wykonują zapytań.
+    """
+    from .models import DerivedFile
+
+    now = timezone.now()
+    resolution = settings.DERIVED_FILE_ACCESS_RESOLUTION
+    if session_id is not None and cache.add(f"derived-access:s:{session_id}", 1, resolution):
+        DerivedFile.objects.filter(session_id=session_id).update(last_access=now)
+
+    fresh = [
+        path for path in paths
+        if cache.add(f"derived-access:p:{hashlib.sha1(path.encode()).hexdigest()}", 1, resolution)
+    ]
+    if fresh:
+        DerivedFile.objects.filter(path__in=fresh).update(last_access=now)
+
+
+# ==========================================
+# SKANOWANIE I EWIKCJA
+# ==========================================
+
+def scan(kind):
+    """
+    Uzgadnia rejestr DerivedFile z dyskiem: nowe pliki dostają czas użycia równy mtime,
+    wpisy plików usuniętych w inny sposób znikają. Wersje z manifestu nie trafiają do
+    rejestru ani do budżetu. Zwraca liczbę plików klasy.
+    """
+    from .models import DerivedFile, Photo, Session
+
+    on_disk = {}
+    for dirpath, dirnames, filenames in os.walk(os.path.join(settings.MEDIA_ROOT, CLASS_ROOTS[kind])):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for filename in filenames:
+            # Pliki tymczasowe zapisu atomowego (.render-*, .zip-*)
+            if filename.startswith(".") or (kind == "renditions" and _is_manifest_rendition(filename)):
+                continue
+            full_path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(full_path)
+            except FileNotFoundError:
+                continue
+            on_disk[os.path.relpath(full_path, settings.MEDIA_ROOT).replace(os.sep, "/")] = stat
+
+    known = dict(DerivedFile.objects.filter(kind=kind).values_list("path", "size"))
+    for batch in _chunks(known.keys() - on_disk.keys()):
+        DerivedFile.objects.filter(path__in=batch).delete()
+
+    sessions, session_key = {}, _rendition_digest
+    if kind == "renditions":
+        sessions = {
+            hashlib.sha256(image.encode()).hexdigest(): session_id
+            for image, session_id in Photo.objects.values_list("image", "session_id").iterator()
+        }
+    elif kind == "sprites":
+        sessions = {str(pk): pk for pk in Session.objects.values_list("pk", flat=True).iterator()}
+        session_key = _sprite_session
+
+    DerivedFile.objects.bulk_create([
+        DerivedFile(
+            path=name,
+            kind=kind,
+            size=stat.st_size,
+            session_id=sessions.get(session_key(name)),
+            last_access=datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc),
+        )
+        for name, stat in on_disk.items() if name not in known
+    ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    for name, stat in on_disk.items():
+        if name in known and known[name] != stat.st_size:
+            DerivedFile.objects.filter(path=name).update(size=stat.st_size)
+    return len(on_disk)
+
+
+def select_victims(kind, budget, now=None):
+    """
+    Pliki do usunięcia: starsze niż max_age_days, a potem najdawniej używane ponad max_bytes.
+    Archiwa zamówień w okresie pobierania (ORDER_DOWNLOAD_DAYS) nie są brane pod uwagę.
+    """
+    from .models import DerivedFile
+
+    now = now or timezone.now()
+    all_files = files = DerivedFile.objects.filter(kind=kind)
+    if kind == "zips":
+        files = files.exclude(path__in=_downloadable_zips(now))
+    victims = {}
+
+    if budget.get("max_age_days") is not None:
+        expired = files.filter(last_access__lt=now - timedelta(days=budget["max_age_days"]))
+        victims.update((pk, (path, size, session_id)) for pk, path, size, session_id
+                       in expired.values_list("pk", "path", "size", "session_id"))
+
+    if budget.get("max_bytes") is not None:
+        # Chronione archiwa też zajmują budżet - za nie ustępują pozostałe pliki
+        total = (all_files.aggregate(total=Sum("size"))["total"] or 0) - sum(v[1] for v in victims.values())
+        lru = files.order_by("last_access", "pk").values_list("pk", "path", "size", "session_id")
+        for pk, path, size, session_id in lru.iterator():
+            if total <= budget["max_bytes"]:
+                break
+            if pk not in victims:
+                victims[pk] = (path, size, session_id)
+                total -= size
+    return victims
+
+
+def _downloadable_zips(now):
+    # Archiwa, do których prowadzi link z e-maila wysłanego w okresie ORDER_DOWNLOAD_DAYS
+    from .models import Order
+
+    return Order.objects.filter(
+        status=Order.FULFILLED, fulfilled_at__gte=now - timedelta(days=settings.ORDER_DOWNLOAD_DAYS),
+    ).exclude(zip_file="").values("zip_file")
+
+
+def evict(kind, victims):
+    """Usuwa pliki i dba o spójność: ścieżki archiwów zamówień, mapy arkuszy, rejestr."""
+    from .models import DerivedFile
+
+    removed, reclaimed = {}, 0
+    for pk, (path, size, session_id) in victims.items():
+        if not _is_derived(kind, path):
+            print(f"Janitor: pominięto plik spoza klasy {kind}: {path}")
+            continue
+        full_path = os.path.join(settings.MEDIA_ROOT, path)
+        try:
+            os.remove(full_path)
+            reclaimed += size
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Janitor: nie udało się usunąć {path}: {e}")
+            continue
+        _prune_empty_dirs(os.path.dirname(full_path))
+        removed[pk] = (path, session_id)
+
+    if kind == "zips":
+        _forget_zips([path for path, _ in removed.values()])
+    elif kind == "sprites":
+        _forget_sprites(removed.values())
+
+    for batch in _chunks(removed):
+        DerivedFile.objects.filter(pk__in=batch).delete()
+    return len(removed), reclaimed
+
+
+def _forget_zips(paths):
+    # Strona sukcesu zbuduje archiwum ponownie przy następnym wejściu
+    from .models import Order
+
+    for batch in _chunks(paths):
+        Order.objects.filter(zip_file__in=batch).update(zip_file="")
+
+
+def _forget_sprites(removed):
+    # Mapa z brakującym arkuszem jest kasowana - siatka wraca do osobnych obrazów,
+    # a galeria zbuduje arkusze ponownie. Usunięcie starych arkuszy nie zmienia nic.
+    from .models import Session
+
+    names = {path for path, _ in removed}
+    session_ids = {session_id for _, session_id in removed if session_id is not None}
+    stale = [
+        pk for pk, manifest in Session.objects.filter(pk__in=session_ids).values_list("pk", "sprites")
+        if names & set(sheet_names(manifest))
+    ]
+    for batch in _chunks(stale):
+        Session.objects.filter(pk__in=batch).update(sprites={})
+
+
+def enforce(kind, budget):
+    scanned = scan(kind)
+    evicted, reclaimed = evict(kind, select_victims(kind, budget))
+    return {"files": scanned - evicted, "evicted": evicted, "reclaimed": reclaimed}
+
+
+def enforce_all(budgets=None):
+    """Egzekwuje budżety wszystkich klas. Jeden janitor naraz, także między procesami."""
+    budgets = settings.DERIVED_FILE_BUDGETS if budgets is None else budgets
+    with single_flight("janitor", dedicated=True):
+        return {kind: enforce(kind, budget) for kind, budget in budgets.items()}
+
+
+# ==========================================
+# TRYB W TLE
+# ==========================================
+
+def _run_periodic(interval):
+    while True:
+        # Pierwsze przejście po interwale - nie przy starcie procesu (migracje, komendy)
+        time.sleep(interval)
+        try:
+            enforce_all()
+        except Exception as e:
+            print(f"Błąd janitora: {e}")
+        finally:
+            close_old_connections()
+
+
+def start_periodic(interval):
+    global _periodic_thread
+    if _periodic_thread is None:
+        _periodic_thread = threading.Thread(target=_run_periodic, args=(interval,), name="janitor", daemon=True)
+        _periodic_thread.start()
@@ -0,0 +1,65 @@
+# fotoapp/locks.py
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows - tylko blokady między wątkami jednego procesu
+    fcntl = None
+
+# Katalog plików blokad (względem MEDIA_ROOT) - współdzielony przez wszystkie procesy serwera.
+LOCKS_ROOT = ".locks"
+# Stała liczba plików blokad zamiast pliku na każdą wersję pochodną. Dwa klucze w tym samym
+# pliku czekają na siebie nawzajem, ale katalog nie rośnie razem z liczbą zdjęć.
+LOCK_STRIPES = 256
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _lock_path(key, dedicated=False):
+    if dedicated:
+        return os.path.join(settings.MEDIA_ROOT, LOCKS_ROOT, f"{key}.lock")
+    stripe = int(hashlib.sha256(key.encode()).hexdigest()[:8], 16) % LOCK_STRIPES
+    return os.path.join(settings.MEDIA_ROOT, LOCKS_ROOT, f"{stripe:03d}.lock")
+
+
+@contextmanager
+def _thread_lock(key):
+    # Blokada na klucz; wpis w słowniku żyje tylko dopóki ktoś na nią czeka
+    with _thread_locks_guard:
+        entry = _thread_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _thread_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _thread_locks[key]
+
+
+@contextmanager
+def single_flight(key, dedicated=False):
+    """
+    Wyłączny dostęp do klucza (np. nazwy pliku wersji pochodnej) dla wątków tego procesu
+    i - przez flock - dla innych procesów na tej samej maszynie. Kto czekał, po wejściu
+    powinien sprawdzić, czy poprzednik nie wykonał już pracy.
+    dedicated=True - osobny plik blokady dla długich operacji (nie blokuje innych kluczy).
+    """
+    with _thread_lock(key):
+        if fcntl is None:
+            yield
+            return
+        path = _lock_path(key, dedicated)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,66 @@
+import glob
+import io
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image, features
+from fotoapp import encoding
+
+
+class Command(BaseCommand):
+    help = "Porównuje profile kodowania (rozmiar i czas) na przykładowych zdjęciach."
+
+    def add_arguments(self, parser):
+        parser.add_argument("images", nargs="*", help="Ścieżki do zdjęć (domyślnie static/images/*)")
+        parser.add_argument("--profiles", nargs="*", help="Nazwy profili (domyślnie wszystkie)")
+        parser.add_argument("--repeat", type=int, default=3, help="Liczba powtórzeń kodowania")
+        parser.add_argument("--max-size", type=int, default=1600, help="Dłuższy bok przed kodowaniem (0 = bez zmian)")
+
+    def handle(self, *args, **options):
+        paths = options["images"] or sorted(glob.glob(os.path.join(settings.BASE_DIR, "static", "images", "*")))[:5]
+        profiles = options["profiles"] or list(settings.IMAGE_ENCODING_PROFILES)
+
+        images = []
+        for path in paths:
+            image = Image.open(path)
+            image.load()
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            if options["max_size"]:
+                image.thumbnail((options["max_size"], options["max_size"]))
+            images.append(image)
+        if not images:
+            self.stderr.write("Brak zdjęć do testu.")
+            return
+
+        # Punkt odniesienia: dotychczasowe kodowanie (bazowy JPEG, quality=85)
+        baseline = 0
+        for image in images:
+            buffer = io.BytesIO()
+            image.save(buffer, "JPEG", quality=85)
+            baseline += buffer.tell()
+
+        self.stdout.write(f"Zdjęć: {len(images)}, bazowy JPEG q85: {baseline / len(images) / 1024:.1f} KiB/zdjęcie")
+        self.stdout.write(f"{'profil':<16}{'format':<8}{'KiB/zdj.':>10}{'vs baza':>10}{'ms/zdj.':>10}")
+
+        for name in profiles:
+            profile = encoding.get_profile(name)
+            image_format = (profile["format"] or "JPEG").upper()
+            if image_format != "JPEG" and not features.check(image_format.lower()):
+                self.stdout.write(f"{name:<16}{image_format:<8}{'(brak wsparcia w Pillow)':>30}")
+                continue
+
+            # Ta sama ścieżka co zapis wersji pochodnych; profil bez formatu (np. "original") jako JPEG
+            total_bytes = 0
+            start = time.perf_counter()
+            for _ in range(options["repeat"]):
+                total_bytes = sum(len(encoding.encode(image, name, "JPEG")) for image in images)
+            elapsed = (time.perf_counter() - start) / options["repeat"]
+
+            self.stdout.write(
+                f"{name:<16}{image_format:<8}"
+                f"{total_bytes / len(images) / 1024:>10.1f}"
+                f"{total_bytes / baseline * 100:>9.0f}%"
+                f"{elapsed / len(images) * 1000:>10.1f}"
+            )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from fotoapp.models import Photo, Session
+from fotoapp.renditions import PREVIEW, build_renditions, store_placeholder
+
+
+class Command(BaseCommand):
+    help = (
+        "Generuje wersje pochodne zdjęć i uzupełnia manifest Photo.renditions. "
+        "Zdjęciom z podglądem, ale bez mikro-podglądu (LQIP), dolicza go z pliku podglądu."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Generuj ponownie także istniejące wersje")
+        parser.add_argument("--session", type=int, help="Tylko zdjęcia z podanej sesji (ID)")
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.only("id", "session", "image", "renditions", "placeholder").order_by("id")
+        if options["session"]:
+            photos = photos.filter(session_id=options["session"])
+
+        built = placeholders = failed = 0
+        sessions = set()
+        for photo in photos.iterator():
+            try:
+                if options["force"] or PREVIEW not in (photo.renditions or {}):
+                    build_renditions(photo)
+                    built += 1
+                elif not photo.placeholder:
+                    store_placeholder(photo)
+                    placeholders += 1
+                else:
+                    continue
+                sessions.add(photo.session_id)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Zdjęcie {photo.pk}: {e}")
+
+        # Zapis manifestu nie podbija wersji sesji (photo_bump_session_version) - robimy to raz na sesję
+        Session.objects.filter(pk__in=sessions).update(content_version=F("content_version") + 1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wygenerowano: {built}, mikro-podglądy: {placeholders}, błędy: {failed}"
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from fotoapp.models import Session
+from fotoapp.sprites import build_sprites, current_manifest
+
+
+class Command(BaseCommand):
+    help = (
+        "Buduje arkusze miniatur siatki galerii dla bieżącej wersji zawartości sesji. Kafelki powstają "
+        "tylko z gotowych podglądów - brakujące uzupełnia build_renditions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--session", type=int, help="Tylko podana sesja (ID)")
+
+    def handle(self, *args, **options):
+        sessions = Session.objects.only("id", "content_version", "sprites").order_by("id")
+        if options["session"]:
+            sessions = sessions.filter(pk=options["session"])
+
+        built = failed = 0
+        for session in sessions.iterator():
+            if current_manifest(session) is not None:
+                continue
+            try:
+                manifest = build_sprites(session.pk)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Sesja {session.pk}: {e}")
+                continue
+            if manifest is not None:
+                built += 1
+                self.stdout.write(f"Sesja {session.pk}: {len(manifest['sheets'])} arkuszy, {len(manifest['tiles'])} kafelków")
+
+        self.stdout.write(self.style.SUCCESS(f"Zbudowano: {built}, błędy: {failed}"))
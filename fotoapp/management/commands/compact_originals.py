@@ -0,0 +1,137 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, PngImagePlugin
+from fotoapp import encoding
+from fotoapp.models import Photo, PhotoMetadata
+from fotoapp.models.stats import increment_stats
+
+JPEGTRAN = shutil.which("jpegtran")
+
+
+def same_pixels(path_a, path_b):
+    with Image.open(path_a) as a, Image.open(path_b) as b:
+        return a.mode == b.mode and a.size == b.size and a.tobytes() == b.tobytes()
+
+
+def recompress_png(source, target, strip_metadata):
+    with Image.open(source) as image:
+        options = {"optimize": True}
+        for key in ("icc_profile", "transparency", "dpi", "gamma"):
+            if key in image.info:
+                options[key] = image.info[key]
+        if not strip_metadata:
+            if image.info.get("exif"):
+                options["exif"] = image.info["exif"]
+            text = PngImagePlugin.PngInfo()
+            for key, value in getattr(image, "text", {}).items():
+                text.add_text(key, value)
+            options["pnginfo"] = text
+        image.save(target, format="PNG", **options)
+
+
+def recompress_jpeg(source, target, strip_metadata):
+    # Przepisanie współczynników DCT bez dekodowania - bezstratne z definicji
+    subprocess.run(
+        [JPEGTRAN, "-copy", "none" if strip_metadata else "all", "-optimize", "-progressive",
+         "-outfile", target, source],
+        check=True, capture_output=True,
+    )
+
+
+def compact_file(path, strip_metadata, dry_run):
+    """
+    Zadanie wykonywane w procesie puli. Zwraca (ścieżka, rozmiar przed, rozmiar po, status).
+    Plik jest podmieniany tylko wtedy, gdy nowa wersja jest mniejsza i ma identyczne piksele.
+    """
+    before = os.path.getsize(path)
+    with Image.open(path) as image:
+        image_format = image.format
+
+    if image_format == "PNG":
+        recompress = recompress_png
+    elif image_format == "JPEG" and JPEGTRAN:
+        recompress = recompress_jpeg
+    else:
+        return path, before, before, "pominięty"
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".compact-")
+    os.close(fd)
+    try:
+        recompress(path, tmp_path, strip_metadata)
+        after = os.path.getsize(tmp_path)
+        if after >= before:
+            return path, before, before, "bez zysku"
+        if not same_pixels(path, tmp_path):
+            return path, before, before, "różne piksele"
+        if dry_run:
+            return path, before, after, "do kompaktowania"
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+        return path, before, after, "skompaktowany"
+    except Exception as e:
+        return path, before, before, f"błąd: {e}"
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class Command(BaseCommand):
+    help = (
+        "Bezstratnie zmniejsza oryginały: rekompresja PNG, optymalizacja JPEG przez jpegtran (jeśli jest "
+        "zainstalowany), usuwanie metadanych wg profilu 'original'. Piksele są porównywane przed podmianą. "
+        "Nazwa pliku (skrót treści z uploadu) się nie zmienia - patrz ContentAddressedStorage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Liczba procesów")
+        parser.add_argument("--dry-run", action="store_true", help="Tylko policz możliwy zysk")
+
+    def handle(self, *args, **options):
+        strip_metadata = encoding.get_profile("original")["strip_metadata"]
+        if not JPEGTRAN:
+            self.stdout.write("Brak jpegtran - pliki JPEG zostaną pominięte.")
+
+        names = sorted(set(Photo.objects.values_list("image", flat=True)))
+        paths = {os.path.join(settings.MEDIA_ROOT, name): name for name in names}
+        existing = [path for path in paths if os.path.isfile(path)]
+
+        statuses = Counter()
+        saved = {}
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            results = pool.map(
+                compact_file, existing,
+                [strip_metadata] * len(existing), [options["dry_run"]] * len(existing),
+                chunksize=4,
+            )
+            for path, before, after, status in results:
+                statuses[status.split(":")[0]] += 1
+                if status.startswith("błąd"):
+                    self.stderr.write(f"{paths[path]}: {status}")
+                if after < before:
+                    saved[paths[path]] = (before - after, after)
+
+        if not options["dry_run"]:
+            self.update_sizes(saved)
+
+        total = sum(delta for delta, _ in saved.values())
+        summary = ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()))
+        verb = "Możliwy zysk" if options["dry_run"] else "Odzyskano"
+        self.stdout.write(self.style.SUCCESS(f"{verb}: {filesizeformat(total)} ({summary})"))
+
+    def update_sizes(self, saved):
+        """Nowe rozmiary w PhotoMetadata i SessionStats (plik może należeć do wielu zdjęć)."""
+        photos = Photo.objects.filter(image__in=saved.keys()).values_list("id", "session_id", "image")
+        per_session = Counter()
+        for photo_id, session_id, image in photos:
+            delta, after = saved[image]
+            PhotoMetadata.objects.filter(photo_id=photo_id).update(file_size=after)
+            per_session[session_id] += delta
+        for session_id, delta in per_session.items():
+            increment_stats(session_id, originals_bytes=-delta)
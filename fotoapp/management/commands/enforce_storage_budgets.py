@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from fotoapp.janitor import CLASS_ROOTS, enforce_all, scan, select_victims
+
+
+class Command(BaseCommand):
+    help = (
+        "Usuwa najdawniej używane pliki pochodne (wersje z watermarkiem, archiwa zamówień) ponad "
+        "budżety z settings.DERIVED_FILE_BUDGETS. Oryginały nie są nigdy usuwane."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Tylko pokaż, ile zostałoby usunięte")
+
+    def handle(self, *args, **options):
+        budgets = {kind: budget for kind, budget in settings.DERIVED_FILE_BUDGETS.items() if kind in CLASS_ROOTS}
+
+        if options["dry_run"]:
+            for kind, budget in budgets.items():
+                scan(kind)
+                victims = select_victims(kind, budget)
+                size = sum(v[1] for v in victims.values())
+                self.stdout.write(f"{kind}: do usunięcia {len(victims)} plików ({filesizeformat(size)})")
+            return
+
+        total = 0
+        for kind, result in enforce_all(budgets).items():
+            total += result["reclaimed"]
+            self.stdout.write(
+                f"{kind}: usunięto {result['evicted']} plików ({filesizeformat(result['reclaimed'])}), "
+                f"pozostało {result['files']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Odzyskano łącznie: {filesizeformat(total)}"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from fotoapp.exif import store_metadata
+from fotoapp.models import Photo
+
+
+class Command(BaseCommand):
+    help = "Odczytuje wymiary i dane EXIF zdjęć do tabeli PhotoMetadata."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Odczytaj ponownie także zdjęcia z metadanymi")
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.only("id", "image").order_by("id")
+        if not options["force"]:
+            photos = photos.filter(metadata__isnull=True)
+
+        done = failed = 0
+        for photo in photos.iterator():
+            try:
+                store_metadata(photo)
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Zdjęcie {photo.pk}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Odczytano: {done}, błędy: {failed}"))
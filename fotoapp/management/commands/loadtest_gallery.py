@@ -0,0 +1,260 @@
+import io
+import json
+import math
+import os
+import random
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import stripe
+from PIL import Image, ImageDraw
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import re_path, resolve, reverse
+from django.views.static import serve
+from fotoapp import admission, stripe_stub
+from fotoapp.models import Order, Photo, Session
+from kilar_fotografia import urls
+
+IMG_SRC = re.compile(r'<img[^>]+src="([^"]+)"')
+
+
+def serve_media(request, path):
+    # static() w urls.py ma na sztywno produkcyjny MEDIA_ROOT - tu pliki z katalogu tymczasowego
+    return serve(request, path, document_root=settings.MEDIA_ROOT)
+
+
+# ROOT_URLCONF na czas testu (ten moduł)
+urlpatterns = [
+    pattern for pattern in urls.urlpatterns
+    if getattr(pattern.callback, "__name__", None) != "serve"
+] + [re_path(rf"^{settings.MEDIA_URL.strip('/')}/(?P<path>.*)$", serve_media)]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(p * len(values)) - 1)]
+
+
+def sample_image(index, size):
+    """Zdjęcie testowe z gradientem i kształtami (żeby kodowanie nie było trywialne)."""
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    rng = random.Random(index)
+    for _ in range(40):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse((x, y, x + rng.randrange(20, 200), y + rng.randrange(20, 200)),
+                     fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return SimpleUploadedFile(f"guest_{index}.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.rejected = defaultdict(int)
+        self.findings = defaultdict(int)
+
+    def call(self, endpoint, method, *args, ok=(200, 302, 303, 304), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = method(*args, **kwargs)
+            status = response.status_code
+        except Exception:
+            response, status = None, None
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            if status == 503:
+                self.rejected[endpoint] += 1
+            elif status not in ok:
+                self.errors[endpoint] += 1
+        return response if status in ok else None
+
+    def note(self, finding):
+        with self.lock:
+            self.findings[finding] += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Test obciążeniowy wysłania linku do galerii gościom: check_password -> galeria -> obrazy -> "
+        "koszyk (add + summary) -> checkout na lokalnym stubie Stripe -> webhook -> strona sukcesu. "
+        "Działa na tymczasowej bazie i MEDIA_ROOT - dane produkcyjne nie są ruszane."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--guests", type=int, default=200, help="Liczba gości (przebiegów scenariusza)")
+        parser.add_argument("--concurrency", type=int, default=20, help="Liczba gości jednocześnie")
+        parser.add_argument("--photos", type=int, default=40, help="Liczba zdjęć w sesji testowej")
+        parser.add_argument("--photo-size", default="1600x1067", help="Rozmiar zdjęć testowych")
+        parser.add_argument("--images", type=int, default=12, help="Ile obrazów z galerii pobiera gość")
+        parser.add_argument("--cart-ops", type=int, default=5, help="Ile razy gość dodaje do koszyka")
+        parser.add_argument("--thumbs", type=int, default=3, help="Ile miniatur koszyka pobiera gość")
+        parser.add_argument("--checkout-ratio", type=float, default=0.3, help="Jaka część gości płaci")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp(prefix="loadtest-media-")
+        db_dir = tempfile.mkdtemp(prefix="loadtest-db-")
+        database = settings.DATABASES["default"]
+        database.setdefault("TEST", {})["NAME"] = os.path.join(db_dir, "loadtest.sqlite3")
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Jednorazowy sekret webhooka wspólny dla stuba i aplikacji
+        webhook_secret = f"whsec_loadtest_{secrets.token_hex(16)}"
+        stub = stripe_stub.start(webhook_secret)
+        # Pula procesów renderujących nie widzi tymczasowego MEDIA_ROOT - renderujemy w wątkach
+        overrides = override_settings(
+            MEDIA_ROOT=media_root,
+            STRIPE_WEBHOOK_SECRET=webhook_secret,
+            ROOT_URLCONF=__name__,
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            IMAGE_RENDER_WORKERS=0,
+            DERIVED_FILE_JANITOR_INTERVAL=None,
+        )
+        overrides.enable()
+        previous_controller = admission._controller
+        admission._controller = None
+        try:
+            with mock.patch.object(stripe, "api_base", stub.base_url):
+                session = self.seed(options)
+                recorder, elapsed = self.run(session, stub, options)
+            self.report(recorder, elapsed, options)
+        finally:
+            admission._controller = previous_controller
+            overrides.disable()
+            stub.shutdown()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+            shutil.rmtree(db_dir, ignore_errors=True)
+
+    def seed(self, options):
+        width, height = (int(v) for v in options["photo_size"].split("x"))
+        session = Session.objects.create(name="Wesele - test obciążeniowy", password="goscie2024")
+        session.access_token = session.generate_new_token()
+        session.save()
+        started = time.perf_counter()
+        for i in range(options["photos"]):
+            Photo.objects.create(session=session, image=sample_image(i, (width, height)), price=25)
+        self.stdout.write(f"Sesja testowa: {options['photos']} zdjęć ({time.perf_counter() - started:.1f} s)")
+        return session
+
+    def run(self, session, stub, options):
+        recorder = Recorder()
+        photo_ids = list(session.photos.values_list("id", flat=True))
+
+        def guest(index):
+            rng = random.Random(options["seed"] * 100003 + index)
+            client = Client()
+            try:
+                self.guest_flow(client, rng, recorder, session, stub, photo_ids, options)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            list(pool.map(guest, range(options["guests"])))
+        return recorder, time.perf_counter() - started
+
+    def guest_flow(self, client, rng, recorder, session, stub, photo_ids, options):
+        response = recorder.call("check_password", client.post, reverse("check_password"),
+                                 {"password": session.password})
+        if response is None:
+            return
+
+        location = response["Location"]
+        response = recorder.call("gallery_view", client.get, location)
+        if response is None:
+            # Inny gość zalogował się w międzyczasie - check_password zmienił access_token
+            if not Session.objects.filter(access_token=resolve(location).kwargs["access_token"]).exists():
+                recorder.note("token_rotated")
+            return
+
+        images = [url for url in IMG_SRC.findall(response.content.decode()) if url.startswith(settings.MEDIA_URL)]
+        for url in rng.sample(images, min(options["images"], len(images))):
+            recorder.call("media", client.get, url.split("?")[0])
+
+        summary = None
+        for photo_id in rng.sample(photo_ids, min(options["cart_ops"], len(photo_ids))):
+            recorder.call("api_cart_add", client.post, reverse("api_cart_add", args=[photo_id]))
+            summary = recorder.call("api_cart_summary", client.get, reverse("api_cart_summary"))
+
+        if summary is not None:
+            for item in summary.json()["items"][:options["thumbs"]]:
+                recorder.call("serve_encrypted_image", client.get, item["thumb"], HTTP_ACCEPT="image/webp,*/*")
+
+        if rng.random() >= options["checkout_ratio"]:
+            return
+        response = recorder.call("checkout", client.post, reverse("checkout"))
+        if response is None:
+            return
+
+        # Klient "płaci" w stubie, Stripe wysyła webhook, klient wraca na stronę sukcesu
+        session_id = response["Location"].rsplit("/", 1)[1]
+        stub.pay(session_id)
+        with stub.lock:
+            event = next(e for e in stub.events if e["data"]["object"]["id"] == session_id)
+        payload = json.dumps(event)
+        recorder.call(
+            "stripe_webhook", client.post, reverse("stripe_webhook"), data=payload, content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=stripe_stub.sign_payload(payload, settings.STRIPE_WEBHOOK_SECRET),
+        )
+        recorder.call("payment_success", client.get, reverse("payment_success"), {"session_id": session_id})
+
+    def report(self, recorder, elapsed, options):
+        self.stdout.write(
+            f"\n{options['guests']} gości, {options['concurrency']} jednocześnie, czas {elapsed:.1f} s, "
+            f"zamówienia zrealizowane: {Order.objects.filter(status=Order.FULFILLED).count()}\n"
+        )
+        header = f"{'endpoint':<24}{'żądania':>9}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'błędy':>8}{'503':>6}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+
+        all_latencies, total_errors = [], 0
+        for endpoint, latencies in recorder.latencies.items():
+            latencies.sort()
+            all_latencies += latencies
+            errors = recorder.errors[endpoint]
+            total_errors += errors
+            self.stdout.write(
+                f"{endpoint:<24}{len(latencies):>9}{len(latencies) / elapsed:>8.1f}"
+                f"{percentile(latencies, 0.50) * 1000:>9.1f}{percentile(latencies, 0.95) * 1000:>9.1f}"
+                f"{percentile(latencies, 0.99) * 1000:>9.1f}{errors / len(latencies):>8.1%}"
+                f"{recorder.rejected[endpoint]:>6}"
+            )
+
+        all_latencies.sort()
+        self.stdout.write("-" * len(header))
+        self.stdout.write(
+            f"{'razem':<24}{len(all_latencies):>9}{len(all_latencies) / elapsed:>8.1f}"
+            f"{percentile(all_latencies, 0.50) * 1000:>9.1f}{percentile(all_latencies, 0.95) * 1000:>9.1f}"
+            f"{percentile(all_latencies, 0.99) * 1000:>9.1f}"
+            f"{(total_errors / len(all_latencies)) if all_latencies else 0:>8.1%}"
+            f"{sum(recorder.rejected.values()):>6}"
+        )
+
+        rotated = recorder.findings["token_rotated"]
+        if rotated:
+            self.stdout.write(self.style.WARNING(
+                f"\nUstalenie: {rotated} z {options['guests']} gości dostało 404 galerii. check_password "
+                "zmienia access_token przy każdym logowaniu, więc równoczesne logowania tym samym hasłem "
+                "unieważniają sobie nawzajem link z przekierowania."
+            ))
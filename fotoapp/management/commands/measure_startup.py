@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Ciężkie pakiety wczytywane dopiero przy pierwszym użyciu (płatność, renderowanie obrazów).
+# Obsługa zwykłych stron nie powinna ich importować.
+LAZY_MODULES = ("stripe", "PIL", "cryptography")
+
+# Zmienna środowiskowa z nazwą bazy dla mierzonego procesu (testy - żeby nie otwierał db.sqlite3)
+DATABASE_ENV = "MEASURE_STARTUP_DATABASE"
+
+# Skrypt uruchamiany w świeżym interpreterze: start aplikacji WSGI (jak worker serwera)
+# i jedno żądanie. Wynik wypisuje jako JSON na stdout.
+CHILD_SCRIPT = """
+import io, json, os, sys
+from django.conf import settings
+if os.environ.get("MEASURE_STARTUP_DATABASE"):
+    settings.DATABASES["default"]["NAME"] = os.environ["MEASURE_STARTUP_DATABASE"]
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+statuses = []
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": sys.argv[1], "SERVER_NAME": "localhost", "SERVER_PORT": "80",
+    "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr, "wsgi.url_scheme": "http",
+}
+response = application(environ, lambda status, headers: statuses.append(status))
+b"".join(response)
+response.close()
+status = int(statuses[0].split()[0])
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+except ImportError:
+    rss = None
+print(json.dumps({
+    "status": status,
+    "rss": rss,
+    "loaded": [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Wiersze -X importtime: (moduł, czas własny us, czas łączny us, czy import najwyższego poziomu)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(own), int(cumulative), not name[1:].startswith(" ")))
+    return rows
+
+
+def measure(path="/", database=None):
+    """
+    Uruchamia CHILD_SCRIPT z -X importtime i zwraca czasy importów, RSS i wczytane ciężkie moduły.
+    database - nazwa bazy zamiast tej z ustawień (np. ":memory:").
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "kilar_fotografia.settings"))
+    if database:
+        env[DATABASE_ENV] = str(database)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT, path, *LAZY_MODULES],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["imports"] = parse_importtime(result.stderr)
+    return report
+
+
+class Command(BaseCommand):
+    help = (
+        "Mierzy start workera: czas importów (python -X importtime), szczytowe RSS po obsłużeniu "
+        "jednego żądania i to, czy wczytano pakiety ładowane leniwie (stripe, Pillow, cryptography)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/", help="Adres żądania obsługiwanego po starcie")
+        parser.add_argument("--runs", type=int, default=3, help="Liczba pomiarów (raportowany najszybszy)")
+        parser.add_argument("--top", type=int, default=15, help="Ile najwolniejszych importów pokazać")
+
+    def handle(self, *args, **options):
+        reports = [measure(options["path"]) for _ in range(max(options["runs"], 1))]
+        best = min(reports, key=lambda r: sum(own for _, own, _, _ in r["imports"]))
+        total = sum(own for _, own, _, _ in best["imports"])
+
+        self.stdout.write(f"Żądanie GET {options['path']}: HTTP {best['status']}")
+        self.stdout.write(f"Czas importów: {total / 1000:.1f} ms ({len(best['imports'])} modułów)")
+        if best["rss"] is not None:
+            self.stdout.write(f"Szczytowe RSS: {max(r['rss'] for r in reports) / 1024 ** 2:.1f} MB")
+
+        self.stdout.write(f"\n{'moduł (import najwyższego poziomu)':<48}{'łącznie ms':>12}")
+        top_level = sorted((row for row in best["imports"] if row[3]), key=lambda row: -row[2])
+        for name, _, cumulative, _ in top_level[:options["top"]]:
+            self.stdout.write(f"{name:<48}{cumulative / 1000:>12.1f}")
+
+        if best["loaded"]:
+            self.stdout.write(self.style.WARNING(f"\nWczytane ciężkie pakiety: {', '.join(best['loaded'])}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"\nBez ciężkich pakietów ({', '.join(LAZY_MODULES)})"))
@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from fotoapp import cleanup
+from fotoapp.models import Photo, Session
+from fotoapp.renditions import rendition_name
+from fotoapp.storage import ORIGINALS_ROOT, content_name, file_digest
+
+
+def link_file(source, target):
+    """
+    Udostępnia plik pod nową nazwą, nie ruszając starej (twardy link, a gdy się nie da - kopia).
+    Stare nazwy usuwa sweeper dopiero po zapisaniu nowych ścieżek w bazie.
+    """
+    if os.path.exists(target):
+        # Ta sama zawartość (albo poprzednie, przerwane uruchomienie)
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".upload-")
+        os.close(fd)
+        try:
+            shutil.copy2(source, tmp_path)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def plan_original(photo):
+    """Liczy skrót oryginału (I/O - wykonywane równolegle) i zwraca nową nazwę pliku."""
+    with open(os.path.join(settings.MEDIA_ROOT, photo.image.name), "rb") as f:
+        digest = file_digest(f)
+    return content_name(digest, photo.image.name)
+
+
+class Command(BaseCommand):
+    help = (
+        "Przenosi oryginały i wersje pochodne do układu adresowanego treścią "
+        "(photos/ab/cd/<sha256>, renditions/ab/cd/...) i aktualizuje ścieżki w Photo. Stare pliki "
+        "(także miniatury tworzone leniwie i dawne pliki watermarked_image, zastąpione podglądem) "
+        "są usuwane przez dziennik sprzątania dopiero po zapisaniu nowych ścieżek - przerwane "
+        "uruchomienie można po prostu powtórzyć."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Liczba równoległych wątków")
+        parser.add_argument("--batch-size", type=int, default=500, help="Liczba zdjęć na partię")
+        parser.add_argument("--dry-run", action="store_true", help="Tylko pokaż, co zostałoby przeniesione")
+
+    def handle(self, *args, **options):
+        photos = (
+            Photo.objects.exclude(image__startswith=f"{ORIGINALS_ROOT}/")
+            .only("id", "session", "image", "watermarked_image", "renditions")
+            .order_by("id")
+        )
+        moved = missing = 0
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            batch = []
+            for photo in photos.iterator(chunk_size=options["batch_size"]):
+                batch.append(photo)
+                if len(batch) >= options["batch_size"]:
+                    m, x = self.migrate_batch(pool, batch, options["dry_run"])
+                    moved, missing = moved + m, missing + x
+                    batch = []
+            if batch:
+                m, x = self.migrate_batch(pool, batch, options["dry_run"])
+                moved, missing = moved + m, missing + x
+
+        self.stdout.write(self.style.SUCCESS(f"Przeniesiono: {moved}, brakujące pliki: {missing}"))
+
+    def migrate_batch(self, pool, photos, dry_run):
+        existing = [p for p in photos if os.path.isfile(os.path.join(settings.MEDIA_ROOT, p.image.name))]
+        for photo in photos:
+            if photo not in existing:
+                self.stderr.write(f"Brak pliku zdjęcia {photo.pk}: {photo.image.name}")
+
+        new_names = list(pool.map(plan_original, existing))
+        if dry_run:
+            for photo, new_name in zip(existing, new_names):
+                self.stdout.write(f"{photo.image.name} -> {new_name}")
+            return len(existing), len(photos) - len(existing)
+
+        moves, stale = [], []
+        for photo, new_name in zip(existing, new_names):
+            old_name = photo.image.name
+            moves.append((old_name, new_name))
+            # Wpis starego oryginału usuwa też wersje spoza manifestu (miniatury tworzone
+            # leniwie) - sweeper wyznacza ich nazwy ze ścieżki, odbudują się pod nową nazwą
+            stale.append((old_name, old_name))
+            photo.image.name = new_name
+            # Dawna wersja z logo - galerie używają podglądu z manifestu
+            if photo.watermarked_image:
+                stale.append((photo.watermarked_image.name, old_name))
+                photo.watermarked_image = None
+
+            # Wersje pochodne dostają nazwy wynikające z nowej ścieżki oryginału
+            manifest = {}
+            for rendition, entry in (photo.renditions or {}).items():
+                formats = {}
+                for image_format, name in entry.get("formats", {"jpeg": entry["name"]}).items():
+                    formats[image_format] = rendition_name(photo, rendition, image_format)
+                    moves.append((name, formats[image_format]))
+                    stale.append((name, old_name))
+                manifest[rendition] = {**entry, "name": formats.get("jpeg", entry["name"]), "formats": formats}
+            photo.renditions = manifest
+
+        def apply(move):
+            source, target = (os.path.join(settings.MEDIA_ROOT, name) for name in move)
+            if source != target and os.path.isfile(source):
+                link_file(source, target)
+
+        # Duplikaty (ta sama zawartość) trafiają pod tę samą nazwę - linkujemy każdą parę raz.
+        # Błąd przerywa komendę przed zapisem w bazie - stare ścieżki nadal działają.
+        list(pool.map(apply, dict.fromkeys(moves)))
+
+        # Nazwy, pod którymi pliki zostają (także oryginał, który nie zmienił nazwy)
+        kept = {target for _, target in moves}
+        with transaction.atomic():
+            Photo.objects.bulk_update(existing, ["image", "watermarked_image", "renditions"])
+            # bulk_update omija sygnały - unieważniamy cache galerii ręcznie
+            Session.objects.filter(pk__in={p.session_id for p in existing}).update(
+                content_version=F("content_version") + 1
+            )
+            # Właściciel = stary oryginał: sweeper zostawi pliki, jeśli wskazuje na nie
+            # jeszcze nieprzeniesione zdjęcie (duplikat w kolejnej partii)
+            cleanup.journal(entries=[entry for entry in stale if entry[0] not in kept])
+        cleanup.sweep_all()
+        return len(existing), len(photos) - len(existing)
@@ -0,0 +1,53 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from fotoapp.models import Order, OrderItem, Photo, Session, SessionStats
+
+
+def file_size(name):
+    try:
+        return os.path.getsize(os.path.join(settings.MEDIA_ROOT, name))
+    except OSError:
+        return 0
+
+
+def renditions_size(photo_renditions):
+    total = 0
+    for entry in (photo_renditions or {}).values():
+        sizes = entry.get("sizes")
+        if sizes is None:
+            # Manifest sprzed zapisywania rozmiarów - sprawdzamy pliki
+            sizes = {fmt: file_size(name) for fmt, name in entry.get("formats", {"jpeg": entry["name"]}).items()}
+        total += sum(sizes.values())
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        "Przelicza od zera statystyki sesji: liczbę zdjęć, rozmiar oryginałów i wersji pochodnych "
+        "oraz sprzedaż (pozycje zrealizowanych zamówień). Dodań do koszyka nie da się odtworzyć - "
+        "koszyk żyje tylko w sesji przeglądarki, więc ten licznik nie jest zmieniany."
+    )
+
+    def handle(self, *args, **options):
+        totals = {pk: [0, 0, 0] for pk in Session.objects.values_list("pk", flat=True)}
+        photos = Photo.objects.values_list("session_id", "image", "renditions", "metadata__file_size")
+        for session_id, image, photo_renditions, size in photos.iterator(chunk_size=1000):
+            row = totals[session_id]
+            row[0] += 1
+            row[1] += size or file_size(image)
+            row[2] += renditions_size(photo_renditions)
+
+        sales = dict(
+            OrderItem.objects.filter(order__status=Order.FULFILLED).exclude(session=None)
+            .values("session_id").annotate(count=Count("id")).values_list("session_id", "count")
+        )
+        for session_id, (count, originals, derived) in totals.items():
+            SessionStats.objects.update_or_create(session_id=session_id, defaults={
+                "photo_count": count,
+                "originals_bytes": originals,
+                "renditions_bytes": derived,
+                "sales": sales.get(session_id, 0),
+            })
+        self.stdout.write(self.style.SUCCESS(f"Przeliczono statystyki {len(totals)} sesji"))
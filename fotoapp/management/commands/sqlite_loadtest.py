@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Konfiguracja domyślna Django/sqlite3: dziennik DELETE, transakcje DEFERRED, timeout 5 s.
+DEFAULT_PROFILE = {
+    "pragmas": {},
+    "begin": "BEGIN",
+    "timeout": 5.0,
+}
+
+
+def tuned_profile():
+    options = settings.DATABASES["default"].get("OPTIONS", {})
+    return {
+        "pragmas": {"journal_mode": settings.SQLITE_JOURNAL_MODE, **settings.SQLITE_PRAGMAS},
+        "begin": f"BEGIN {options.get('transaction_mode', 'DEFERRED')}",
+        "timeout": options.get("timeout", 5.0),
+    }
+
+
+def connect(path, profile):
+    conn = sqlite3.connect(path, timeout=profile["timeout"], isolation_level=None, check_same_thread=False)
+    for key, value in profile["pragmas"].items():
+        conn.execute(f"PRAGMA {key}={value}")
+    return conn
+
+
+class Command(BaseCommand):
+    help = (
+        "Test obciążeniowy SQLite: wiele wątków zapisuje sesje (odczyt + zapis w jednej transakcji, "
+        "jak zapis koszyka) przy równoległych odczytach. Porównuje profil domyślny i SQLITE_PRAGMAS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8, help="Liczba wątków zapisujących")
+        parser.add_argument("--readers", type=int, default=4, help="Liczba wątków czytających")
+        parser.add_argument("--seconds", type=float, default=5.0, help="Czas trwania każdego przebiegu")
+        parser.add_argument("--rows", type=int, default=200, help="Liczba wierszy (sesji) w tabeli")
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, profile in (("domyślny", DEFAULT_PROFILE), ("dostrojony", tuned_profile())):
+                path = os.path.join(tmp, f"{name}.sqlite3")
+                results[name] = self.run_profile(path, profile, options)
+
+        self.stdout.write(f"{'profil':<12}{'zapisy/s':>10}{'odczyty/s':>11}{'locked':>9}{'p99 zapisu ms':>15}")
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:<12}{r['writes'] / r['elapsed']:>10.0f}{r['reads'] / r['elapsed']:>11.0f}"
+                f"{r['locked']:>9}{r['p99']:>15.1f}"
+            )
+
+    def run_profile(self, path, profile, options):
+        setup = connect(path, profile)
+        setup.execute("CREATE TABLE session (key INTEGER PRIMARY KEY, data TEXT, hits INTEGER)")
+        setup.executemany("INSERT INTO session VALUES (?, ?, 0)", [(i, "{}") for i in range(options["rows"])])
+        setup.close()
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        stats = {"writes": 0, "reads": 0, "locked": 0, "latencies": []}
+
+        def writer(seed):
+            conn = connect(path, profile)
+            key = seed
+            while not stop.is_set():
+                key = (key * 31 + 7) % options["rows"]
+                start = time.perf_counter()
+                try:
+                    conn.execute(profile["begin"])
+                    # Odczyt przed zapisem - jak SessionStore.save() czy check_password
+                    conn.execute("SELECT data FROM session WHERE key = ?", (key,)).fetchone()
+                    conn.execute("UPDATE session SET data = ?, hits = hits + 1 WHERE key = ?", (f'{{"k": {key}}}', key))
+                    conn.execute("COMMIT")
+                except sqlite3.OperationalError as e:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    if "locked" in str(e) or "busy" in str(e):
+                        with lock:
+                            stats["locked"] += 1
+                        continue
+                    raise
+                with lock:
+                    stats["writes"] += 1
+                    stats["latencies"].append(time.perf_counter() - start)
+            conn.close()
+
+        def reader(seed):
+            conn = connect(path, profile)
+            key = seed
+            while not stop.is_set():
+                key = (key * 17 + 3) % options["rows"]
+                try:
+                    conn.execute("SELECT data, hits FROM session WHERE key = ?", (key,)).fetchone()
+                except sqlite3.OperationalError:
+                    with lock:
+                        stats["locked"] += 1
+                    continue
+                with lock:
+                    stats["reads"] += 1
+            conn.close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(options["writers"])]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(options["readers"])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(options["seconds"])
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(stats["latencies"]) or [0]
+        return {
+            "writes": stats["writes"],
+            "reads": stats["reads"],
+            "locked": stats["locked"],
+            "elapsed": elapsed,
+            "p99": latencies[int(len(latencies) * 0.99) - 1 if len(latencies) > 1 else 0] * 1000,
+        }
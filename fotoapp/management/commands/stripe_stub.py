@@ -0,0 +1,31 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from fotoapp import stripe_stub
+
+
+class Command(BaseCommand):
+    help = (
+        "Uruchamia lokalny zamiennik API Stripe (fotoapp/stripe_stub.py). Aplikację kierujemy na niego "
+        "zmienną środowiskową STRIPE_API_BASE=http://127.0.0.1:<port>. Zdarzenia są podpisywane "
+        "sekretem STRIPE_WEBHOOK_SECRET - serwer aplikacji musi mieć ustawiony ten sam."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=12111)
+        parser.add_argument(
+            "--webhook-url",
+            default="http://127.0.0.1:8000/stripe/webhook/",
+            help="Adres, na który stub wysyła podpisane zdarzenia checkout.session.completed",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.STRIPE_WEBHOOK_SECRET:
+            raise CommandError("Ustaw zmienną środowiskową STRIPE_WEBHOOK_SECRET (ta sama dla serwera aplikacji)")
+        server = stripe_stub.start(settings.STRIPE_WEBHOOK_SECRET, options["webhook_url"], port=options["port"])
+        self.stdout.write(self.style.SUCCESS(f"Stub Stripe działa na {server.base_url} (Ctrl+C kończy)"))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
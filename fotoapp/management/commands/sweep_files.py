@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from fotoapp.cleanup import sweep_all
+from fotoapp.models import FileCleanup
+
+
+class Command(BaseCommand):
+    help = "Usuwa pliki z dziennika sprzątania (FileCleanup) partiami."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Liczba wpisów na partię")
+
+    def handle(self, *args, **options):
+        processed = sweep_all(options["batch_size"])
+        stuck = FileCleanup.objects.count()
+        self.stdout.write(self.style.SUCCESS(f"Obsłużono wpisów: {processed}, pozostało (błędy): {stuck}"))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-19 17:38
+
+import fotoapp.models.photo
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotoapp', '0009_photo_watermarked_image_alter_photo_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='photo',
+            name='image',
+            field=models.ImageField(max_length=500, upload_to=fotoapp.models.photo.session_directory_path, verbose_name='Oryginał'),
+        ),
+        migrations.AlterField(
+            model_name='photo',
+            name='watermarked_image',
+            field=models.ImageField(blank=True, max_length=500, null=True, upload_to=fotoapp.models.photo.watermarked_directory_path, verbose_name='Wersja z logo'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotoapp', '0010_photo_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotoapp', '0011_session_content_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoMetadata',
+            fields=[
+                ('photo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='metadata', serialize=False, to='fotoapp.photo')),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('orientation', models.PositiveSmallIntegerField(default=1, help_text='Wartość tagu EXIF Orientation (1-8)')),
+                ('taken_at', models.DateTimeField(blank=True, null=True, verbose_name='Data wykonania')),
+                ('camera_make', models.CharField(blank=True, max_length=100)),
+                ('camera_model', models.CharField(blank=True, max_length=100)),
+                ('lens_model', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['taken_at'], name='photometa_taken_at_idx'), models.Index(fields=['camera_model'], name='photometa_camera_model_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-19 17:44
+
+import fotoapp.models.photo
+import fotoapp.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotoapp', '0012_photometadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='photo',
+            name='image',
+            field=models.ImageField(max_length=500, storage=fotoapp.storage.get_photo_storage, upload_to=fotoapp.models.photo.session_directory_path, verbose_name='Oryginał'),
+        ),
+    ]
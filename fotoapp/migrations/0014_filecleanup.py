@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotoapp', '0013_photo_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileCleanup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Ścieżka względem MEDIA_ROOT', max_length=500)),
+                ('owner', models.CharField(blank=True, max_length=500)),
+                ('is_directory', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Plik do usunięcia',
+                'verbose_name_plural': 'Pliki do usunięcia',
+                'indexes': [models.Index(fields=['attempts', 'id'], name='filecleanup_queue_idx')],
+            },
+        ),
+    ]
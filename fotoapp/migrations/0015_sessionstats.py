@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 17:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotoapp', '0014_filecleanup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionStats',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='fotoapp.session')),
+                ('photo_count', models.IntegerField(default=0, verbose_name='Liczba zdjęć')),
+                ('originals_bytes', models.BigIntegerField(default=0, verbose_name='Rozmiar oryginałów')),
+                ('renditions_bytes', models.BigIntegerField(default=0, verbose_name='Rozmiar wersji pochodnych')),
+                ('cart_adds', models.IntegerField(default=0, verbose_name='Dodania do koszyka')),
+                ('sales', models.IntegerField(default=0, verbose_name='Sprzedane zdjęcia')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='photometadata',
+            name='file_size',
+            field=models.BigIntegerField(default=0, help_text='Rozmiar pliku oryginału w bajtach'),
+        ),
+    ]
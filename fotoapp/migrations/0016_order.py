@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-19 17:55
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotoapp', '0015_sessionstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stripe_session_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Oczekuje na płatność'), ('paid', 'Opłacone'), ('fulfilling', 'W realizacji'), ('fulfilled', 'Zrealizowane')], default='pending', max_length=20)),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('zip_file', models.CharField(blank=True, help_text='Ścieżka archiwum względem MEDIA_ROOT', max_length=500)),
+                ('email_sent', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('fulfilled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='fotoapp.order')),
+                ('photo', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to='fotoapp.photo')),
+                ('session', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to='fotoapp.session')),
+            ],
+        ),
+    ]
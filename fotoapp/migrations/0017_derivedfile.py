@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 17:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotoapp', '0016_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DerivedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Ścieżka względem MEDIA_ROOT', max_length=500, unique=True)),
+                ('kind', models.CharField(max_length=20)),
+                ('size', models.BigIntegerField(default=0)),
+                ('last_access', models.DateTimeField()),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='fotoapp.session')),
+            ],
+            options={
+                'verbose_name': 'Plik pochodny',
+                'verbose_name_plural': 'Pliki pochodne',
+                'indexes': [models.Index(fields=['kind', 'last_access'], name='derivedfile_lru_idx')],
+            },
+        ),
+    ]
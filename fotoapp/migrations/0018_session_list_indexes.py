@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-19 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotoapp', '0017_derivedfile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='session',
+            name='name',
+            field=models.CharField(db_collation='NOCASE', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['created_at', 'id'], name='session_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['name'], name='session_name_idx'),
+        ),
+    ]
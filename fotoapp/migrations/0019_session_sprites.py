@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotoapp', '0018_session_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='sprites',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotoapp', '0019_session_sprites'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='placeholder',
+            field=models.CharField(blank=True, editable=False, max_length=1400),
+        ),
+    ]
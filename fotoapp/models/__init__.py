@@ -1,2 +1,7 @@
 from .session import Session
 from .photo import Photo
+from .metadata import PhotoMetadata
+from .cleanup import FileCleanup
+from .stats import SessionStats
+from .order import Order, OrderItem
+from .derived import DerivedFile
@@ -0,0 +1,22 @@
+from django.db import models
+
+# Dziennik plików do usunięcia. Usuwanie rekordów (zdjęć, sesji) tylko dopisuje tu ścieżki,
+# a same pliki kasuje w tle sweeper (fotoapp/cleanup.py), poza transakcją żądania.
+class FileCleanup(models.Model):
+    path = models.CharField(max_length=500, help_text="Ścieżka względem MEDIA_ROOT")
+    # Oryginał, do którego należy plik. Pliki adresowane treścią mogą być współdzielone -
+    # jeśli inne zdjęcie nadal używa tego oryginału, plik zostaje.
+    owner = models.CharField(max_length=500, blank=True)
+    # Katalog: usuwane są tylko puste podkatalogi (np. stare session_photos/<sesja>/...)
+    is_directory = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Plik do usunięcia"
+        verbose_name_plural = "Pliki do usunięcia"
+        indexes = [models.Index(fields=['attempts', 'id'], name='filecleanup_queue_idx')]
+
+    def __str__(self):
+        return self.path
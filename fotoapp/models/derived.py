@@ -0,0 +1,21 @@
+from django.db import models
+from .session import Session
+
+# Rejestr plików pochodnych (wersje z watermarkiem, archiwa zamówień), które można
+# odtworzyć z oryginałów. Janitor (fotoapp/janitor.py) usuwa najdawniej używane,
+# gdy klasa plików przekroczy budżet z settings.DERIVED_FILE_BUDGETS.
+class DerivedFile(models.Model):
+    path = models.CharField(max_length=500, unique=True, help_text="Ścieżka względem MEDIA_ROOT")
+    kind = models.CharField(max_length=20)
+    size = models.BigIntegerField(default=0)
+    # Sesja, do której należy wersja pochodna - jej odsłona galerii odświeża last_access
+    session = models.ForeignKey(Session, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    last_access = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Plik pochodny"
+        verbose_name_plural = "Pliki pochodne"
+        indexes = [models.Index(fields=['kind', 'last_access'], name='derivedfile_lru_idx')]
+
+    def __str__(self):
+        return self.path
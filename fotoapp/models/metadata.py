@@ -0,0 +1,38 @@
+from django.db import models
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .photo import Photo
+from ..exif import store_metadata
+
+# Metadane zdjęcia (wymiary, orientacja, EXIF) odczytywane jednorazowo przy wgrywaniu.
+# Dzięki temu widoki sortują po dacie wykonania w bazie i nie otwierają plików przy renderowaniu.
+class PhotoMetadata(models.Model):
+    photo = models.OneToOneField(Photo, related_name='metadata', on_delete=models.CASCADE, primary_key=True)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    orientation = models.PositiveSmallIntegerField(default=1, help_text="Wartość tagu EXIF Orientation (1-8)")
+    taken_at = models.DateTimeField(null=True, blank=True, verbose_name="Data wykonania")
+    camera_make = models.CharField(max_length=100, blank=True)
+    camera_model = models.CharField(max_length=100, blank=True)
+    lens_model = models.CharField(max_length=100, blank=True)
+    file_size = models.BigIntegerField(default=0, help_text="Rozmiar pliku oryginału w bajtach")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['taken_at'], name='photometa_taken_at_idx'),
+            models.Index(fields=['camera_model'], name='photometa_camera_model_idx'),
+        ]
+
+    def __str__(self):
+        return f"Metadata for photo {self.photo_id}"
+
+
+# Metadane odczytujemy raz, przy wgrywaniu zdjęcia.
+@receiver(post_save, sender=Photo)
+def photo_extract_metadata(sender, instance, created, **kwargs):
+    if not created:
+        return
+    try:
+        store_metadata(instance)
+    except Exception as e:
+        print(f"Błąd odczytu metadanych zdjęcia {instance.pk}: {e}")
@@ -0,0 +1,48 @@
+import uuid
+from django.db import models
+from .session import Session
+from .photo import Photo
+
+# Zamówienie tworzone przy przejściu do płatności. Realizacja (ZIP, e-mail) odbywa się
+# raz na zamówienie - kolejne wejścia na stronę sukcesu tylko odczytują zapisany wynik.
+class Order(models.Model):
+    PENDING = "pending"
+    PAID = "paid"
+    FULFILLING = "fulfilling"
+    FULFILLED = "fulfilled"
+    STATUS_CHOICES = [
+        (PENDING, "Oczekuje na płatność"),
+        (PAID, "Opłacone"),
+        (FULFILLING, "W realizacji"),
+        (FULFILLED, "Zrealizowane"),
+    ]
+
+    # Jednoznaczny klucz realizacji; NULL tylko przez chwilę, zanim Stripe zwróci ID sesji
+    stripe_session_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    # Niezgadywalny identyfikator w nazwie pliku ZIP
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    email = models.EmailField(blank=True)
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    zip_file = models.CharField(max_length=500, blank=True, help_text="Ścieżka archiwum względem MEDIA_ROOT")
+    email_sent = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    paid_at = models.DateTimeField(null=True, blank=True)
+    # Początek realizacji (PAID -> FULFILLING). Po ORDER_FULFILLMENT_LEASE bez zakończenia
+    # zamówienie może przejąć kolejna próba - proces mógł zginąć w trakcie.
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    fulfilled_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Order {self.pk} ({self.status})"
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
+    # Zdjęcie lub sesja mogą zostać później usunięte - pozycja zamówienia zostaje
+    photo = models.ForeignKey(Photo, related_name='order_items', null=True, on_delete=models.SET_NULL)
+    session = models.ForeignKey(Session, related_name='order_items', null=True, on_delete=models.SET_NULL)
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+
+    def __str__(self):
+        return f"Item {self.photo_id} of order {self.order_id}"
@@ -1,14 +1,14 @@
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.db import models
+from django.db import models, transaction
 from django.utils.html import mark_safe
 from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.conf import settings
-from .session import Session
+from .session import Session, bump_content_version
+from .. import cleanup, encoding, renditions, watermarking
+from ..storage import get_photo_storage
 import os
 import sys
 from io import BytesIO
-from PIL import Image
 
 def session_directory_path(instance, filename):
     session_name_slug = instance.session.name.replace(' ', '_').lower()
@@ -18,12 +18,43 @@ def watermarked_directory_path(instance, filename):
     session_name_slug = instance.session.name.replace(' ', '_').lower()
     return os.path.join('session_photos', session_name_slug, 'watermarked', filename)
 
+class PhotoQuerySet(models.QuerySet):
+    # Kolejność chronologiczna wg daty wykonania z EXIF (zdjęcia bez daty na końcu).
+    def by_capture_time(self):
+        return self.order_by(models.F('metadata__taken_at').asc(nulls_last=True), 'id')
+
+    # Usuwanie zbiorcze: ścieżki plików trafiają do dziennika jednym INSERT-em, rekordy
+    # znikają zapytaniami DELETE ... IN (bez sygnałów na każde zdjęcie), a pliki kasuje
+    # sweeper w tle po zatwierdzeniu transakcji.
+    def delete(self):
+        from .stats import record_photos_deleted
+
+        with transaction.atomic():
+            rows = list(self.values_list(
+                "session_id", "image", "watermarked_image", "renditions", "metadata__file_size"
+            ))
+            entries = []
+            for _, image, watermarked_image, _, _ in rows:
+                entries += cleanup.photo_file_entries(image, watermarked_image)
+            cleanup.journal(entries)
+            record_photos_deleted((row[0], row[4], row[3]) for row in rows)
+
+            result = super(PhotoQuerySet, self.only("id")).delete()
+            Session.objects.filter(pk__in={row[0] for row in rows}).update(
+                content_version=models.F("content_version") + 1
+            )
+        cleanup.schedule_sweep()
+        return result
+
 class Photo(models.Model):
     session = models.ForeignKey(Session, related_name='photos', on_delete=models.CASCADE)
     
     # ilosc znakow pod dlugie sciezki plikow
+    # Pliki trafiają do układu adresowanego treścią (fotoapp/storage.py),
+    # upload_to zostaje tylko dla zgodności ze starszymi migracjami
     image = models.ImageField(
         upload_to=session_directory_path, 
+        storage=get_photo_storage,
         verbose_name="Oryginał",
         max_length=500  
     )
@@ -38,6 +69,15 @@ class Photo(models.Model):
     
     price = models.DecimalField(max_digits=8, decimal_places=2, default=0.00, help_text="Cena zdjęcia w PLN")
 
+    # Manifest wersji pochodnych: {nazwa: {"name": ścieżka, "formats": .., "sizes": .., "width": .., "version": ..}}.
+    # Dzięki niemu szablony budują URL-e z pamięci, bez sprawdzania plików na dysku.
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # Mikro-podgląd JPEG (base64, do 1 KB) liczony przy wgrywaniu razem z podglądem.
+    # Galeria wstawia go w HTML jako rozmyte tło karty, zanim dotrze właściwy obraz.
+    placeholder = models.CharField(max_length=1400, blank=True, editable=False)
+
+    objects = PhotoQuerySet.as_manager()
+
     def __str__(self):
         return f"Photo {self.id} for {self.session.name}"
 
@@ -50,35 +90,29 @@ class Photo(models.Model):
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        return Photo.objects.filter(pk=self.pk).delete()
+
+    def rendition_url(self, rendition, image_format=None):
+        """Zwraca URL wersji pochodnej z manifestu albo None, jeśli jeszcze nie istnieje."""
+        entry = (self.renditions or {}).get(rendition)
+        if not entry:
+            return None
+        return renditions.rendition_url(entry, image_format)
+
     def apply_watermark(self):
-        """Generuje wersję zdjęcia z nałożonym logo (watermark.png)."""
+        """Generuje wersję zdjęcia z nałożonym logo (styl "cover" silnika znaków wodnych)."""
         if not self.image:
             return
 
-        img = Image.open(self.image)
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
-
-        watermark_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'logo.png')
-
         try:
-            watermark = Image.open(watermark_path).convert("RGBA")
-        except FileNotFoundError:
-            print(f"BŁĄD: Nie znaleziono pliku logo pod ścieżką: {watermark_path}")
+            final_img = watermarking.render(self.image, "cover")
+        except FileNotFoundError as e:
+            print(f"BŁĄD: Nie znaleziono pliku logo: {e}")
             return
 
-        target_width = int(img.width * 0.30)
-        aspect_ratio = watermark.width / watermark.height
-        target_height = int(target_width / aspect_ratio)
-        watermark = watermark.resize((target_width, target_height), Image.Resampling.LANCZOS)
-
-        x = (img.width - target_width) // 2
-        y = (img.height - target_height) // 2
-        img.paste(watermark, (x, y), watermark)
-
-        final_img = img.convert('RGB')
         output = BytesIO()
-        final_img.save(output, format='JPEG', quality=85)
+        encoding.save(final_img, output, 'preview')
         output.seek(0)
 
         file_name = os.path.basename(self.image.name)
@@ -93,12 +127,25 @@ class Photo(models.Model):
             None
         )
 
-@receiver(post_delete, sender=Photo)
-def photo_delete(sender, instance, **kwargs):
-    if instance.image:
-        if os.path.isfile(instance.image.path):
-            os.remove(instance.image.path)
-    
-    if instance.watermarked_image:
-        if os.path.isfile(instance.watermarked_image.path):
-            os.remove(instance.watermarked_image.path)
\ No newline at end of file
+# Wersje pochodne generujemy raz, przy wgrywaniu zdjęcia.
+@receiver(post_save, sender=Photo)
+def photo_build_renditions(sender, instance, created, **kwargs):
+    if not created:
+        return
+    try:
+        renditions.build_renditions(instance)
+    except Exception as e:
+        # Brak wersji nie blokuje uploadu - podgląd wyrenderuje serve_encrypted_image przy pierwszym wyświetleniu
+        print(f"Błąd generowania wersji zdjęcia {instance.pk}: {e}")
+
+# Pola zapisywane przez build_renditions. Przy uploadzie wersję i tak podbija zapis samego
+# zdjęcia, a komenda build_renditions podbija ją raz na sesję - bez podwójnych podbić.
+MANIFEST_FIELDS = frozenset({"renditions", "placeholder"})
+
+# Każda zmiana zdjęcia unieważnia cache galerii jego sesji.
+# Usuwanie podbija wersję w PhotoQuerySet.delete() - jednym zapytaniem dla wszystkich sesji.
+@receiver(post_save, sender=Photo)
+def photo_bump_session_version(sender, instance, update_fields=None, **kwargs):
+    if update_fields and update_fields <= MANIFEST_FIELDS:
+        return
+    bump_content_version(instance.session_id)
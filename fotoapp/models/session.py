@@ -1,14 +1,38 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.utils.crypto import get_random_string
-from django.dispatch import receiver
-from django.db.models.signals import post_delete
-from django.conf import settings
+from .. import cleanup
 import os
 
+def session_directory(name):
+    session_name_slug = name.replace(' ', '_').lower()
+    return os.path.join('session_photos', session_name_slug)
+
+class SessionQuerySet(models.QuerySet):
+    # Usuwa zdjęcia zbiorczo (PhotoQuerySet.delete) i dopisuje stare katalogi sesji
+    # do dziennika sprzątania, zamiast kaskady z sygnałem na każde zdjęcie.
+    def delete(self):
+        from .photo import Photo
+        from ..sprites import SPRITES_ROOT, sheet_names
+
+        with transaction.atomic():
+            rows = list(self.values_list("pk", "name", "sprites"))
+            Photo.objects.filter(session__in=self).delete()
+            cleanup.journal(
+                entries=[(name, "") for _, _, manifest in rows for name in sheet_names(manifest)],
+                directories=[session_directory(name) for _, name, _ in rows]
+                + [f"{SPRITES_ROOT}/{pk}" for pk, _, _ in rows],
+            )
+            result = super().delete()
+        cleanup.schedule_sweep()
+        return result
+
 # Definicja modelu "Session" reprezentującego sesje fotograficzne.
 class Session(models.Model):
-    name = models.CharField(max_length=100)
+    # NOCASE - wyszukiwanie po początku nazwy (LIKE 'abc%') bez rozróżniania wielkości liter
+    # może wtedy korzystać z indeksu na name
+    name = models.CharField(max_length=100, db_collation="NOCASE")
     description = models.TextField(blank=True)
     password = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -20,8 +44,20 @@ class Session(models.Model):
         on_delete=models.SET_NULL,
         related_name='cover_for_session'
     )
+    # Wersja zawartości galerii - część klucza cache fragmentu z siatką zdjęć.
+    # Zwiększana przy każdej zmianie zdjęć sesji (patrz bump_content_version).
+    content_version = models.PositiveIntegerField(default=1, editable=False)
+    # Mapa arkuszy miniatur siatki galerii dla danej wersji zawartości (fotoapp/sprites.py)
+    sprites = models.JSONField(default=dict, blank=True, editable=False)
 
+    objects = SessionQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            # Stronicowanie listy sesji po (created_at, id) - patrz adminpanel_views.session_list
+            models.Index(fields=['created_at', 'id'], name='session_created_idx'),
+            models.Index(fields=['name'], name='session_name_idx'),
+        ]
 
     # Nadpisanie metody save() do automatycznego generowania tokenu i hasła przed zapisem.
     def save(self, *args, **kwargs):
@@ -29,8 +65,21 @@ class Session(models.Model):
             self.access_token = str(uuid.uuid4())
         if not self.password:
             self.password = self.generate_new_password()
+        # Przy edycji nie nadpisujemy content_version wartością wczytaną wcześniej -
+        # mogłoby to cofnąć wersję podbitą w międzyczasie i przywrócić nieaktualny cache.
+        # To samo dotyczy mapy arkuszy, którą zapisuje wątek w tle (fotoapp/sprites.py).
+        if not self._state.adding and "update_fields" not in kwargs:
+            kwargs["update_fields"] = [
+                f.attname for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ("content_version", "sprites")
+            ]
         super().save(*args, **kwargs)
 
+    # Atomowo zwiększa wersję zawartości, unieważniając cache galerii.
+    def bump_content_version(self):
+        bump_content_version(self.pk)
+        self.content_version += 1
+
     # Generuje nowe losowe hasło o długości 12 znaków.
     def generate_new_password(self):
         return get_random_string(12)
@@ -44,16 +93,11 @@ class Session(models.Model):
         self.password = self.generate_new_password()
         self.save()
 
+    def delete(self, *args, **kwargs):
+        return Session.objects.filter(pk=self.pk).delete()
+
     def __str__(self):
         return self.name
 
-# Sygnał Django, który jest wywoływany po usunięciu obiektu Session z bazy danych.
-# Jego celem jest usunięcie powiązanego folderu ze zdjęciami, jeśli jest pusty.
-@receiver(post_delete, sender=Session)
-def session_delete(sender, instance, **kwargs):
-    session_name_slug = instance.name.replace(' ', '_').lower()
-    session_dir = os.path.join(settings.MEDIA_ROOT, 'session_photos', session_name_slug)
-
-    if os.path.isdir(session_dir):
-        if not os.listdir(session_dir):
-            os.rmdir(session_dir) 
\ No newline at end of file
+def bump_content_version(session_id):
+    Session.objects.filter(pk=session_id).update(content_version=F("content_version") + 1)
@@ -0,0 +1,75 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .session import Session
+from .photo import Photo
+from ..renditions import manifest_bytes
+
+# Zestawienie dla listy sesji w panelu (liczba zdjęć, zajęte miejsce, koszyk, sprzedaż).
+# Aktualizowane przyrostowo przy wgrywaniu/usuwaniu zdjęć i w widokach koszyka, a w całości
+# przeliczane komendą: python manage.py recompute_session_stats
+class SessionStats(models.Model):
+    session = models.OneToOneField(Session, related_name='stats', on_delete=models.CASCADE, primary_key=True)
+    photo_count = models.IntegerField(default=0, verbose_name="Liczba zdjęć")
+    originals_bytes = models.BigIntegerField(default=0, verbose_name="Rozmiar oryginałów")
+    # Wersje zapisane w manifeście Photo.renditions (miniatury koszyka liczy tylko komenda)
+    renditions_bytes = models.BigIntegerField(default=0, verbose_name="Rozmiar wersji pochodnych")
+    cart_adds = models.IntegerField(default=0, verbose_name="Dodania do koszyka")
+    sales = models.IntegerField(default=0, verbose_name="Sprzedane zdjęcia")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for session {self.session_id}"
+
+
+def increment_stats(session_id, **deltas):
+    """Dodaje wartości do liczników sesji jednym UPDATE-em (bez wyścigu odczyt-zapis)."""
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas or session_id is None:
+        return
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if SessionStats.objects.filter(pk=session_id).update(updated_at=timezone.now(), **changes):
+        return
+    # Sesja sprzed wprowadzenia statystyk - wiersz tworzymy przy pierwszej zmianie
+    try:
+        with transaction.atomic():
+            SessionStats.objects.create(session_id=session_id, **deltas)
+    except IntegrityError:
+        SessionStats.objects.filter(pk=session_id).update(updated_at=timezone.now(), **changes)
+
+
+def record_photos_deleted(rows):
+    """Odejmuje usunięte zdjęcia; rows: (session_id, rozmiar oryginału, manifest) na zdjęcie."""
+    per_session = {}
+    for session_id, file_size, photo_renditions in rows:
+        totals = per_session.setdefault(session_id, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += file_size or 0
+        totals[2] += manifest_bytes(photo_renditions)
+    for session_id, (count, originals, derived) in per_session.items():
+        increment_stats(session_id, photo_count=-count, originals_bytes=-originals, renditions_bytes=-derived)
+
+
+@receiver(post_save, sender=Session)
+def session_create_stats(sender, instance, created, **kwargs):
+    if created:
+        SessionStats.objects.get_or_create(session=instance)
+
+
+@receiver(post_save, sender=Photo)
+def photo_record_stats(sender, instance, created, **kwargs):
+    if not created:
+        return
+    try:
+        original = instance.image.size if instance.image else 0
+    except OSError:
+        original = 0
+    # Manifest jest już wypełniony przez photo_build_renditions (odbiornik zarejestrowany wcześniej)
+    increment_stats(
+        instance.session_id,
+        photo_count=1,
+        originals_bytes=original,
+        renditions_bytes=manifest_bytes(instance.renditions),
+    )
@@ -0,0 +1,127 @@
+# fotoapp/orders.py
+import os
+import tempfile
+import zipfile
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+ZIPS_ROOT = "zips"
+
+
+def create_order(cart, photos_map):
+    """Tworzy zamówienie (status PENDING) z pozycji koszyka, dla zdjęć które nadal istnieją."""
+    from .models import Order, OrderItem
+
+    with transaction.atomic():
+        order = Order.objects.create()
+        items = [
+            OrderItem(order=order, photo=photos_map[int(pid)], session_id=photos_map[int(pid)].session_id,
+                      price=Decimal(str(entry.get("price", 0))))
+            for pid, entry in cart.items() if int(pid) in photos_map
+        ]
+        OrderItem.objects.bulk_create(items)
+        order.total = sum((item.price for item in items), Decimal("0"))
+        order.save(update_fields=["total"])
+    return order
+
+
+def mark_paid(order, email=""):
+    """Zapisuje płatność (idempotentnie - status realizacji nie jest cofany)."""
+    from .models import Order
+
+    Order.objects.filter(pk=order.pk, status=Order.PENDING).update(status=Order.PAID, paid_at=timezone.now())
+    if email and not order.email:
+        Order.objects.filter(pk=order.pk, email="").update(email=email)
+    order.refresh_from_db()
+    return order
+
+
+def build_zip(order):
+    """Pakuje oryginały zamówienia do zips/zamowienie_<token>.zip (zapis atomowy)."""
+    name = f"{ZIPS_ROOT}/zamowienie_{order.token.hex}.zip"
+    target_path = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), prefix=".zip-")
+    try:
+        with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, "w", compression=zipfile.ZIP_STORED) as zip_file:
+            for item in order.items.select_related("photo").exclude(photo=None):
+                original_path = item.photo.image.path
+                if os.path.exists(original_path):
+                    zip_file.write(original_path, arcname=f"{item.photo_id}_{os.path.basename(original_path)}")
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return name
+
+
+def ensure_zip(order):
+    """Archiwum zrealizowanego zamówienia; odtwarza je, jeśli usunął je janitor."""
+    from .models import Order
+
+    if order.zip_file and os.path.exists(os.path.join(settings.MEDIA_ROOT, order.zip_file)):
+        return order.zip_file
+    order.zip_file = build_zip(order)
+    Order.objects.filter(pk=order.pk).update(zip_file=order.zip_file)
+    return order.zip_file
+
+
+def send_order_email(order, zip_url):
+    try:
+        send_mail(
+            subject='Twoje zdjęcia - Kilar Fotografia',
+            message=f'Dziękujemy za zakup!\n\nTwoje zdjęcia są gotowe do pobrania pod tym linkiem:\n{zip_url}\n\n'
+                    f'Link jest aktywny przez {settings.ORDER_DOWNLOAD_DAYS} dni.\n\nPozdrawiamy,\nZespół Kilar Fotografia',
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[order.email],
+            fail_silently=False,
+        )
+        return True
+    except Exception as e:
+        print(f"Błąd wysyłki maila: {e}")
+        return False
+
+
+def fulfill(order, zip_url_for):
+    """
+    Realizuje opłacone zamówienie dokładnie raz. Wyłączność daje warunkowy UPDATE
+    PAID -> FULFILLING: kto go wygra, buduje ZIP i wysyła e-mail, pozostali (odświeżenie
+    strony, równoległe żądanie) dostają zamówienie w stanie, w jakim jest.
+    Realizację przerwaną śmiercią procesu przejmuje próba po ORDER_FULFILLMENT_LEASE.
+    zip_url_for(name) zamienia ścieżkę archiwum na bezwzględny URL do e-maila.
+    """
+    from .models import Order
+    from .models.stats import increment_stats
+
+    now = timezone.now()
+    expired = Q(claimed_at__lt=now - timedelta(seconds=settings.ORDER_FULFILLMENT_LEASE)) | Q(claimed_at=None)
+    claimable = Q(status=Order.PAID) | (Q(status=Order.FULFILLING) & expired)
+    if not Order.objects.filter(claimable, pk=order.pk).update(status=Order.FULFILLING, claimed_at=now):
+        order.refresh_from_db()
+        return order
+
+    try:
+        name = build_zip(order)
+    except Exception:
+        # Następna próba (odświeżenie strony) zacznie od nowa
+        Order.objects.filter(pk=order.pk).update(status=Order.PAID)
+        raise
+
+    email_sent = bool(order.email) and send_order_email(order, zip_url_for(name))
+    Order.objects.filter(pk=order.pk).update(
+        status=Order.FULFILLED, zip_file=name, email_sent=email_sent, fulfilled_at=timezone.now()
+    )
+
+    for session_id, sold in Counter(order.items.exclude(session=None).values_list("session_id", flat=True)).items():
+        increment_stats(session_id, sales=sold)
+
+    order.refresh_from_db()
+    return order
@@ -0,0 +1,219 @@
+# fotoapp/renditions.py
+import base64
+import hashlib
+import os
+import tempfile
+from functools import lru_cache
+from django.conf import settings
+from django.core.files.storage import default_storage
+from . import encoding, watermarking
+from .locks import single_flight
+from .storage import RENDITIONS_ROOT, sharded_path
+
+# Nazwa wersji podglądowej (z watermarkiem) używanej w galerii.
+PREVIEW = "preview"
+# Miniatura w koszyku (serve_encrypted_image).
+THUMB = "thumb"
+
+# Formaty wyjściowe wersji pochodnych: nazwa -> (rozszerzenie, MIME).
+# JPEG jest zawsze generowany jako wersja bazowa, pozostałe tylko jeśli Pillow je obsługuje.
+# Parametry kodowania pochodzą z profili w settings.RENDITION_PROFILES.
+FORMATS = {
+    "jpeg": ("jpg", "image/jpeg"),
+    "webp": ("webp", "image/webp"),
+    "avif": ("avif", "image/avif"),
+}
+DEFAULT_FORMAT = "jpeg"
+# Kolejność preferencji przy negocjacji (najmniejsze pliki najpierw).
+FORMAT_PREFERENCE = ("avif", "webp")
+
+# Mikro-podgląd (LQIP) wstawiany w HTML galerii: dłuższy bok w pikselach (kolejne próby)
+# i limit rozmiaru pliku. Około 320 B to nagłówki JPEG, nie piksele.
+PLACEHOLDER_SIZES = (32, 24, 16)
+PLACEHOLDER_MAX_BYTES = 1024
+
+
+@lru_cache(maxsize=None)
+def supported_formats():
+    """Formaty, które zainstalowany Pillow potrafi zapisać (sprawdzane raz na proces)."""
+    from PIL import features
+
+    return [name for name in FORMATS if name == DEFAULT_FORMAT or features.check(name)]
+
+
+def negotiate_format(request, available=None):
+    """
+    Wybiera najlepszy format obrazu na podstawie nagłówka Accept.
+    Odpowiedź zależna od wyniku musi mieć nagłówek Vary: Accept.
+    """
+    available = supported_formats() if available is None else available
+    accepted = set()
+    for part in request.headers.get("Accept", "").split(","):
+        media_type, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(media_type.strip().lower())
+
+    for name in FORMAT_PREFERENCE:
+        if name in available and FORMATS[name][1] in accepted:
+            return name
+    return DEFAULT_FORMAT
+
+
+def profile_for(rendition, image_format):
+    """Nazwa profilu kodowania dla danej wersji i formatu."""
+    return settings.RENDITION_PROFILES[rendition][image_format]
+
+
+def rendition_name_for(image_name, rendition, image_format=DEFAULT_FORMAT):
+    """
+    Nazwa pliku wersji pochodnej względem MEDIA_ROOT, w układzie dwupoziomowym
+    (renditions/ab/cd/...). Klucz to skrót ścieżki oryginału, więc zdjęcia o tej samej
+    zawartości współdzielą wersje, a różne pliki o tej samej nazwie nie kolidują.
+    """
+    key = hashlib.sha256(image_name.encode()).hexdigest()
+    extension = FORMATS[image_format][0]
+    return sharded_path(RENDITIONS_ROOT, key, f"_{rendition}.{extension}")
+
+
+def rendition_name(photo, rendition, image_format=DEFAULT_FORMAT):
+    return rendition_name_for(photo.image.name, rendition, image_format)
+
+
+def all_rendition_names(image_name):
+    """Wszystkie możliwe pliki wersji pochodnych oryginału (także tworzone leniwie)."""
+    return [
+        rendition_name_for(image_name, rendition, image_format)
+        for rendition in settings.RENDITION_PROFILES
+        for image_format in FORMATS
+    ]
+
+
+def manifest_bytes(manifest):
+    """Łączny rozmiar plików opisanych w manifeście (wpisy sprzed dodania "sizes" liczą się jako 0)."""
+    return sum(sum(entry.get("sizes", {}).values()) for entry in (manifest or {}).values())
+
+
+def rendition_url(entry, image_format=None):
+    """
+    Buduje URL na podstawie wpisu z manifestu - bez dotykania dysku.
+    Wersja w query stringu unieważnia cache przeglądarki po przegenerowaniu.
+    Brakujący format (np. manifest sprzed dodania WebP) zastępujemy wersją JPEG.
+    """
+    name = entry.get("formats", {}).get(image_format) or entry["name"]
+    return f"{default_storage.url(name)}?v={entry['version']}"
+
+
+def ensure_rendition(image_name, rendition, image_format=DEFAULT_FORMAT, force=False):
+    """
+    Wspólny cache wyników silnika znaków wodnych: zwraca nazwę pliku wersji pochodnej,
+    renderując ją tylko wtedy, gdy jeszcze nie istnieje na dysku.
+    """
+    name = rendition_name_for(image_name, rendition, image_format)
+    target_path = os.path.join(settings.MEDIA_ROOT, name)
+    if not force and os.path.exists(target_path):
+        return name
+
+    # Równoległe żądania o ten sam plik czekają na jeden render zamiast liczyć go każde osobno
+    with single_flight(name):
+        if not force and os.path.exists(target_path):
+            return name
+        image = watermarking.render(os.path.join(settings.MEDIA_ROOT, image_name), rendition)
+        write_rendition(image, target_path, rendition, image_format)
+    return name
+
+
+def write_rendition(image, target_path, rendition, image_format):
+    write_image(image, target_path, profile_for(rendition, image_format))
+
+
+def write_image(image, target_path, profile):
+    """
+    Koduje do pliku tymczasowego w katalogu docelowym i podmienia go atomowo (os.replace),
+    więc czytający widzą stary plik albo kompletny nowy - nigdy przerwany zapis.
+    """
+    directory = os.path.dirname(target_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".render-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            encoding.save(image, f, profile)
+        if settings.FILE_UPLOAD_PERMISSIONS is not None:
+            os.chmod(tmp_path, settings.FILE_UPLOAD_PERMISSIONS)
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def build_placeholder(image):
+    """
+    Mikro-JPEG (profil "placeholder") zakodowany w base64 - rozmyte tło karty, zanim dotrze
+    właściwy podgląd. Pusty napis, jeśli żaden rozmiar nie mieści się w PLACEHOLDER_MAX_BYTES.
+    """
+    from PIL import Image
+
+    for size in PLACEHOLDER_SIZES:
+        scale = size / max(image.size)
+        small = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.Resampling.BILINEAR, reducing_gap=3.0,
+        ).convert("RGB")
+        data = encoding.encode(small, "placeholder")
+        if len(data) <= PLACEHOLDER_MAX_BYTES:
+            return base64.b64encode(data).decode()
+    return ""
+
+
+def store_placeholder(photo):
+    """Uzupełnia mikro-podgląd zdjęcia z istniejącego podglądu JPEG (bez ponownego renderowania)."""
+    from PIL import Image
+
+    entry = (photo.renditions or {}).get(PREVIEW)
+    if not entry:
+        return ""
+    with Image.open(os.path.join(settings.MEDIA_ROOT, entry["name"])) as preview:
+        preview.draft("RGB", (PLACEHOLDER_SIZES[0] * 4, PLACEHOLDER_SIZES[0] * 4))
+        photo.placeholder = build_placeholder(preview)
+    type(photo).objects.filter(pk=photo.pk).update(placeholder=photo.placeholder)
+    return photo.placeholder
+
+
+def build_renditions(photo, save=True):
+    """
+    Generuje wersje pochodne zdjęcia i zapisuje ich opis (ścieżka, wymiary, wersja)
+    w manifeście Photo.renditions. Wywoływane raz przy wgrywaniu zdjęcia.
+    """
+    if not photo.image:
+        return photo.renditions
+
+    # Renderujemy raz, kodujemy do każdego obsługiwanego formatu
+    image = watermarking.render(photo.image.path, PREVIEW)
+
+    formats, sizes = {}, {}
+    for image_format in supported_formats():
+        name = rendition_name(photo, PREVIEW, image_format)
+        target_path = os.path.join(settings.MEDIA_ROOT, name)
+        write_rendition(image, target_path, PREVIEW, image_format)
+        formats[image_format] = name
+        sizes[image_format] = os.path.getsize(target_path)
+
+    previous = (photo.renditions or {}).get(PREVIEW) or {}
+    manifest = dict(photo.renditions or {})
+    manifest[PREVIEW] = {
+        "name": formats[DEFAULT_FORMAT],
+        "formats": formats,
+        "sizes": sizes,
+        "width": image.width,
+        "height": image.height,
+        "version": previous.get("version", 0) + 1,
+    }
+    photo.renditions = manifest
+    # Mikro-podgląd z tego samego renderu - ten sam kadr i znak wodny co podgląd
+    photo.placeholder = build_placeholder(image)
+
+    if save and photo.pk:
+        photo.save(update_fields=["renditions", "placeholder"])
+    return manifest
+
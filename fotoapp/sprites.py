@@ -0,0 +1,162 @@
+# fotoapp/sprites.py
+import asyncio
+import math
+import os
+import threading
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from . import cleanup
+from .locks import single_flight
+from .renditions import PREVIEW, write_image
+
+# Arkusze miniatur siatki galerii: GALLERY_SPRITE_SIZE kafelków w jednym pliku JPEG zamiast
+# osobnego obrazu na każdą kartę. Mapa położeń jest zapisywana na Session.sprites razem
+# z wersją zawartości sesji, dla której arkusze zbudowano - po zmianie zdjęć siatka wraca
+# do osobnych obrazów, dopóki w tle nie powstaną nowe arkusze. Budowanie idzie przez pulę
+# renderowania (fotoapp/admission.py) i korzysta tylko z gotowych podglądów.
+SPRITES_ROOT = "sprites"
+# Kafelek ma wysokość karty w static/css/gallery.css (.photo-card, height: 350px)
+TILE_SIZE = (400, 350)
+TILE_BACKGROUND = (30, 30, 47)
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def sheet_name(session_id, version, index):
+    # Wersja w nazwie - arkusz nigdy się nie zmienia, więc może być cache'owany bez końca
+    return f"{SPRITES_ROOT}/{session_id}/{version}-{index}.jpg"
+
+
+def sheet_names(manifest):
+    return [sheet["name"] for sheet in (manifest or {}).get("sheets", [])]
+
+
+def current_manifest(session):
+    """Mapa arkuszy, jeśli zbudowano ją dla bieżącej wersji zawartości sesji, inaczej None."""
+    manifest = session.sprites or {}
+    return manifest if manifest.get("version") == session.content_version else None
+
+
+def tile_style(manifest, photo_id):
+    """
+    Styl CSS kafelka: tło z arkusza przeskalowane tak, że jeden kafelek wypełnia element.
+    Pusty napis, jeśli zdjęcia nie ma w arkuszach (szablon pokazuje wtedy zwykły obraz).
+    """
+    position = (manifest or {}).get("tiles", {}).get(str(photo_id))
+    if position is None:
+        return ""
+    index, col, row = position
+    sheet = manifest["sheets"][index]
+    x = col * 100 / (sheet["cols"] - 1) if sheet["cols"] > 1 else 0
+    y = row * 100 / (sheet["rows"] - 1) if sheet["rows"] > 1 else 0
+    return (
+        f"background-image:url({default_storage.url(sheet['name'])});"
+        f"background-size:{sheet['cols'] * 100}% {sheet['rows'] * 100}%;"
+        f"background-position:{x:.4f}% {y:.4f}%"
+    )
+
+
+def _tile(photo):
+    """
+    Kafelek z gotowego podglądu z watermarkiem (JPEG) - arkusz nie może odsłaniać oryginału.
+    Bez podglądu None: arkusz nie renderuje podglądów, karta pokaże zwykły obraz.
+    """
+    from PIL import Image, ImageOps
+
+    entry = (photo.renditions or {}).get(PREVIEW)
+    path = os.path.join(settings.MEDIA_ROOT, entry["name"]) if entry else None
+    if path is None or not os.path.exists(path):
+        return None
+    with Image.open(path) as preview:
+        preview.draft("RGB", (TILE_SIZE[0] * 2, TILE_SIZE[1] * 2))
+        return ImageOps.fit(preview.convert("RGB"), TILE_SIZE, Image.Resampling.LANCZOS)
+
+
+def build_sprites(session_id):
+    """
+    Buduje arkusze dla bieżącej wersji zawartości sesji i zapisuje mapę na Session.sprites.
+    Jeśli wersja zmieni się w trakcie budowania, wynik jest odrzucany. Zwraca mapę albo None.
+    """
+    from PIL import Image
+    from .models import Photo, Session
+
+    with single_flight(f"sprites-{session_id}", dedicated=True):
+        session = Session.objects.filter(pk=session_id).only("id", "content_version", "sprites").first()
+        if session is None:
+            return None
+        if current_manifest(session) is not None:
+            return session.sprites
+
+        version = session.content_version
+        photos = list(Photo.objects.filter(session_id=session_id).only("id", "renditions").by_capture_time())
+        per_sheet, columns = settings.GALLERY_SPRITE_SIZE, settings.GALLERY_SPRITE_COLUMNS
+        manifest = {"version": version, "sheets": [], "tiles": {}}
+
+        for index, start in enumerate(range(0, len(photos), per_sheet)):
+            chunk = photos[start:start + per_sheet]
+            cols = min(columns, len(chunk))
+            rows = math.ceil(len(chunk) / cols)
+            sheet = Image.new("RGB", (cols * TILE_SIZE[0], rows * TILE_SIZE[1]), TILE_BACKGROUND)
+            for i, photo in enumerate(chunk):
+                col, row = i % cols, i // cols
+                try:
+                    tile = _tile(photo)
+                except Exception as e:
+                    print(f"Błąd kafelka zdjęcia {photo.pk}: {e}")
+                    tile = None
+                if tile is None:
+                    # Bez kafelka karta pokaże zwykły obraz
+                    continue
+                sheet.paste(tile, (col * TILE_SIZE[0], row * TILE_SIZE[1]))
+                manifest["tiles"][str(photo.pk)] = [index, col, row]
+
+            name = sheet_name(session_id, version, index)
+            write_image(sheet, os.path.join(settings.MEDIA_ROOT, name), "sprite")
+            manifest["sheets"].append({"name": name, "cols": cols, "rows": rows})
+
+        updated = Session.objects.filter(pk=session_id, content_version=version).update(sprites=manifest)
+        # Stare arkusze (albo nowe, jeśli wersja zdążyła się zmienić) usuwa sweeper
+        cleanup.journal(entries=[(name, "") for name in sheet_names(session.sprites if updated else manifest)])
+    cleanup.schedule_sweep()
+    return manifest if updated else None
+
+
+# ==========================================
+# BUDOWANIE W TLE
+# ==========================================
+
+def _run_build(session_id):
+    from .admission import Saturated, get_controller
+
+    try:
+        # Przez pulę renderowania - Pillow nie trafia do procesu serwera, a arkusze
+        # dzielą limit pracy CPU z miniaturami
+        asyncio.run(get_controller().run(build_sprites, session_id))
+    except Saturated:
+        # Pula zajęta - arkusze powstaną przy jednej z kolejnych odsłon
+        pass
+    except Exception as e:
+        print(f"Błąd budowania arkuszy sesji {session_id}: {e}")
+    finally:
+        close_old_connections()
+        with _pending_lock:
+            _pending.discard(session_id)
+
+
+def schedule_build(session):
+    """
+    Zleca budowanie arkuszy puli renderowania z wątku w tle (najwyżej jedno na sesję naraz).
+    Małe galerie (poniżej GALLERY_SPRITE_MIN_PHOTOS) zostają przy osobnych obrazach.
+    """
+    if not settings.GALLERY_SPRITE_SIZE:
+        return
+    stats = getattr(session, "stats", None)
+    if stats is None or stats.photo_count < settings.GALLERY_SPRITE_MIN_PHOTOS:
+        return
+    with _pending_lock:
+        if session.pk in _pending:
+            return
+        _pending.add(session.pk)
+    threading.Thread(target=_run_build, args=(session.pk,), name=f"sprites-{session.pk}", daemon=True).start()
@@ -0,0 +1,99 @@
+# fotoapp/storage.py
+import hashlib
+import os
+import tempfile
+from django.core.files.storage import FileSystemStorage
+from .locks import single_flight
+
+# Katalogi główne układu adresowanego treścią (względem MEDIA_ROOT).
+ORIGINALS_ROOT = "photos"
+RENDITIONS_ROOT = "renditions"
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def sharded_path(root, digest, suffix=""):
+    """Dwupoziomowy podział katalogów: <root>/ab/cd/abcd...<suffix>."""
+    return f"{root}/{digest[:2]}/{digest[2:4]}/{digest}{suffix}"
+
+
+def file_digest(fileobj):
+    """SHA-256 zawartości pliku (obiekt plikowy Django lub zwykły), czytany porcjami."""
+    digest = hashlib.sha256()
+    if hasattr(fileobj, "chunks"):
+        for chunk in fileobj.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(digest, filename):
+    return sharded_path(ORIGINALS_ROOT, digest, os.path.splitext(filename)[1].lower())
+
+
+def original_lock_key(name):
+    # Wspólna blokada zapisu oryginału i jego usuwania przez sweeper (fotoapp/cleanup.py)
+    return f"original-{name}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Zapisuje pliki pod skrótem SHA-256 ich zawartości, niezależnie od ścieżki z upload_to.
+    Lokalizacja nie zależy od nazwy sesji, katalogi nie rosną ponad 65 536 podkatalogów,
+    a identyczne pliki są zapisywane tylko raz. Istniejące (starsze) ścieżki nadal działają,
+    bo nazwa pliku jest zawsze względna wobec MEDIA_ROOT.
+
+    Nazwa to skrót treści z chwili uploadu, nie bieżących bajtów pliku: compact_originals
+    bezstratnie przepisuje oryginały (te same piksele) pod dotychczasową nazwą, bo zmiana
+    nazwy przeniosłaby też wszystkie wersje pochodne (klucz to ścieżka oryginału). Ponowny
+    upload tych samych bajtów nadal trafia pod tę nazwę i przejmuje skompaktowany plik.
+    Skrótu pliku nie należy więc porównywać z jego nazwą.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            from django.core.files import File
+            content = File(content, name)
+        name = content_name(file_digest(content), name)
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # Ta sama nazwa oznacza tę samą zawartość - nie dopisujemy sufiksów
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        with single_flight(original_lock_key(name)):
+            if os.path.exists(full_path):
+                # Przejęcie istniejącego pliku: świeży mtime mówi sweeperowi, że plik
+                # z dziennika ma nowego właściciela (wiersz Photo może jeszcze nie istnieć)
+                os.utime(full_path)
+                return name
+
+            # Zapis do pliku tymczasowego i atomowa podmiana - równoległy upload tej samej
+            # zawartości nie zostawi uszkodzonego pliku ani nie zapętli się na FileExistsError
+            directory = os.path.dirname(full_path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in content.chunks():
+                        f.write(chunk)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, full_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return name
+
+
+def get_photo_storage():
+    return ContentAddressedStorage()
@@ -0,0 +1,156 @@
+# fotoapp/stripe_stub.py
+import hashlib
+import hmac
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+from urllib.request import Request, urlopen
+
+# Lokalny zamiennik API Stripe do testów i testów obciążeniowych bez sieci.
+# Obsługuje tylko to, czego używa sklep:
+#   POST /v1/checkout/sessions        - tworzy sesję płatności
+#   GET  /v1/checkout/sessions/<id>   - zwraca sesję
+#   GET  /pay/<id>?email=...          - "klient płaci": sesja staje się opłacona, stub wysyła
+#                                       podpisany webhook checkout.session.completed
+#                                       i przekierowuje na success_url
+# Aplikacja korzysta ze stuba po ustawieniu settings.STRIPE_API_BASE na jego adres.
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """Nagłówek Stripe-Signature (schemat v1) dla treści webhooka."""
+    timestamp = int(timestamp or time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def checkout_completed_event(checkout_session):
+    return {
+        "id": f"evt_{uuid.uuid4().hex}",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "created": int(time.time()),
+        "data": {"object": checkout_session},
+    }
+
+
+def _form_to_dict(body):
+    """Odtwarza zagnieżdżone pola formularza Stripe (a[b][0][c]=x) jako słowniki."""
+    result = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = key.replace("]", "").split("[")
+        target = result
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return result
+
+
+class StripeStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, webhook_secret, webhook_url=None):
+        super().__init__(address, StubHandler)
+        self.webhook_secret = webhook_secret
+        # Bez webhook_url zdarzenia trafiają do listy events (testy wysyłają je same)
+        self.webhook_url = webhook_url
+        self.sessions = {}
+        self.events = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def create_session(self, params):
+        line_items = params.get("line_items", {}).values()
+        amount = sum(int(i["price_data"]["unit_amount"]) * int(i.get("quantity", 1)) for i in line_items)
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        checkout_session = {
+            "id": session_id,
+            "object": "checkout.session",
+            "mode": params.get("mode", "payment"),
+            "amount_total": amount,
+            "currency": "pln",
+            "client_reference_id": params.get("client_reference_id"),
+            "metadata": params.get("metadata", {}),
+            "payment_status": "unpaid",
+            "status": "open",
+            "customer_details": None,
+            "success_url": params.get("success_url"),
+            "cancel_url": params.get("cancel_url"),
+            "url": f"{self.base_url}/pay/{session_id}",
+        }
+        with self.lock:
+            self.sessions[session_id] = checkout_session
+        return checkout_session
+
+    def pay(self, session_id, email="klient@example.com"):
+        """Oznacza sesję jako opłaconą i dostarcza zdarzenie checkout.session.completed."""
+        with self.lock:
+            checkout_session = self.sessions[session_id]
+            checkout_session.update(payment_status="paid", status="complete", customer_details={"email": email})
+        event = checkout_completed_event(checkout_session)
+        if self.webhook_url:
+            self.deliver(event)
+        else:
+            with self.lock:
+                self.events.append(event)
+        return checkout_session
+
+    def deliver(self, event):
+        payload = json.dumps(event)
+        request = Request(self.webhook_url, data=payload.encode(), method="POST", headers={
+            "Content-Type": "application/json",
+            "Stripe-Signature": sign_payload(payload, self.webhook_secret),
+        })
+        with urlopen(request, timeout=30) as response:
+            return response.status
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_found(self):
+        self.send_json(404, {"error": {"type": "invalid_request_error", "message": "No such resource"}})
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != "/v1/checkout/sessions":
+            return self.not_found()
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+        self.send_json(200, self.server.create_session(_form_to_dict(body)))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if parts[:3] == ["v1", "checkout", "sessions"] and len(parts) == 4:
+            checkout_session = self.server.sessions.get(parts[3])
+            return self.send_json(200, checkout_session) if checkout_session else self.not_found()
+
+        if parts[0] == "pay" and len(parts) == 2 and parts[1] in self.server.sessions:
+            email = dict(parse_qsl(url.query)).get("email", "klient@example.com")
+            checkout_session = self.server.pay(parts[1], email)
+            self.send_response(303)
+            self.send_header("Location", checkout_session["success_url"].replace("{CHECKOUT_SESSION_ID}", parts[1]))
+            self.end_headers()
+            return
+        self.not_found()
+
+
+def start(webhook_secret, webhook_url=None, host="127.0.0.1", port=0):
+    """Uruchamia stub w wątku w tle i zwraca serwer (server.base_url, server.shutdown())."""
+    server = StripeStub((host, port), webhook_secret, webhook_url)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
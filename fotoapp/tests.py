@@ -1,3 +1,600 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 
-# Create your tests here.
+import stripe
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from . import cleanup, janitor, stripe_stub
+from .adminpanel_views import SESSIONS_PER_PAGE
+from .locks import LOCKS_ROOT, single_flight
+from .management.commands.measure_startup import LAZY_MODULES, measure
+from .models import FileCleanup, Order, Photo, Session, SessionStats
+from .orders import ZIPS_ROOT
+from .renditions import PREVIEW, THUMB, negotiate_format, rendition_name_for
+from .storage import RENDITIONS_ROOT
+from .tokens import BadToken, make_token, parse_token, photo_token
+from .views import CART_BATCH_LIMIT
+
+
+def session_writes(queries):
+    return [
+        q["sql"] for q in queries
+        if "django_session" in q["sql"] and q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+    ]
+
+
+def jpeg_upload(name, color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+class TempMediaMixin:
+    """Pliki zdjęć w katalogu tymczasowym zamiast MEDIA_ROOT programisty."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class SessionWriteAvoidanceTests(TestCase):
+    def setUp(self):
+        self.session = Session.objects.create(name="Sesja testowa")
+        self.gallery_url = reverse("gallery_view", args=[self.session.access_token])
+
+    def test_repeat_gallery_views_do_not_write_session(self):
+        self.client.get(self.gallery_url)
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(3):
+                self.assertEqual(self.client.get(self.gallery_url).status_code, 200)
+        self.assertEqual(session_writes(ctx.captured_queries), [])
+
+    def test_static_pages_do_not_touch_database(self):
+        self.client.get(self.gallery_url)
+        for name in ("home", "oferta", "kontakt"):
+            with self.assertNumQueries(0):
+                self.client.get(reverse(name))
+
+    def test_cart_summary_does_not_create_session(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("api_cart_summary"))
+        self.assertEqual(session_writes(ctx.captured_queries), [])
+
+
+@override_settings(FILE_CLEANUP_IN_BACKGROUND=False)
+class CartBatchTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        session = Session.objects.create(name="Sesja koszyk")
+        self.photos = [
+            Photo.objects.create(session=session, image=jpeg_upload(f"{i}.jpg", (i * 60, 90, 10)), price=10 + i)
+            for i in range(3)
+        ]
+
+    def batch(self, ops):
+        return self.client.post(
+            reverse("api_cart_batch"), data=json.dumps({"ops": ops}), content_type="application/json"
+        )
+
+    def test_invalid_payloads_are_rejected(self):
+        for body in ("x", "[]", '{"ops": 1}', '{"ops": [{"id": 1}]}', '{"ops": [{"op": "add", "id": "a"}]}'):
+            response = self.client.post(reverse("api_cart_batch"), data=body, content_type="application/json")
+            self.assertEqual(response.status_code, 400, body)
+        # Liczby spoza zakresu INTEGER (także 1e999 = nieskończoność) - 400, nie 500
+        for op in ({"op": "add", "id": 2 ** 63}, {"op": "add", "id": 1e999},
+                   {"op": "set", "id": self.photos[0].id, "qty": 2 ** 64}, {"op": "drop", "id": 1},
+                   {"op": "add", "id": self.photos[0].id, "qty": 0}):
+            self.assertEqual(self.batch([op]).status_code, 400, op)
+
+    def test_operation_limit(self):
+        ops = [{"op": "add", "id": self.photos[0].id}] * CART_BATCH_LIMIT
+        self.assertEqual(self.batch(ops).json()["count"], CART_BATCH_LIMIT)
+        self.assertEqual(self.batch(ops + ops[:1]).status_code, 400)
+
+    def test_one_photo_query_and_one_session_write(self):
+        self.batch([{"op": "add", "id": self.photos[0].id}])
+        ops = [{"op": "set", "id": p.id, "qty": 2} for p in self.photos] + [{"op": "remove", "id": self.photos[0].id}]
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.batch(ops).json()
+        photo_queries = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('SELECT "fotoapp_photo"')]
+        self.assertEqual(len(photo_queries), 1)
+        self.assertIn(" IN (", photo_queries[0])
+        self.assertEqual(len(session_writes(ctx.captured_queries)), 1)
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(data["total"], "56.00")
+
+    def test_deleted_photo_is_dropped_from_cart(self):
+        deleted = self.photos[2]
+        self.batch([{"op": "add", "id": p.id} for p in self.photos])
+        deleted.delete()
+
+        data = self.batch([{"op": "set", "id": deleted.id, "qty": 0}]).json()
+        self.assertEqual(data["missing"], [deleted.id])
+        self.assertEqual(data["count"], 2)
+
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+@override_settings(
+    STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    FILE_CLEANUP_IN_BACKGROUND=False,
+)
+class StripeCheckoutTests(TempMediaMixin, TestCase):
+    """Pełna ścieżka zakupu na lokalnym stubie Stripe (fotoapp/stripe_stub.py)."""
+
+    def setUp(self):
+        super().setUp()
+        self.stub = stripe_stub.start(WEBHOOK_SECRET)
+        self.addCleanup(self.stub.shutdown)
+        api_base = mock.patch.object(stripe, "api_base", self.stub.base_url)
+        api_base.start()
+        self.addCleanup(api_base.stop)
+
+        session = Session.objects.create(name="Sesja sklep")
+        self.photos = [
+            Photo.objects.create(session=session, image=jpeg_upload(f"{i}.jpg", (i * 80, 10, 10)), price=25)
+            for i in range(2)
+        ]
+
+    def checkout(self):
+        for photo in self.photos:
+            self.client.post(reverse("api_cart_add", args=[photo.id]))
+        response = self.client.post(reverse("checkout"))
+        order = Order.objects.get()
+        self.assertEqual(response["Location"], f"{self.stub.base_url}/pay/{order.stripe_session_id}")
+        return order
+
+    def post_event(self, event, secret=WEBHOOK_SECRET):
+        payload = json.dumps(event)
+        return self.client.post(
+            reverse("stripe_webhook"), data=payload, content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=stripe_stub.sign_payload(payload, secret),
+        )
+
+    def success_page(self, order):
+        # Strona sukcesu nie może odpytywać Stripe
+        with mock.patch.object(stripe.checkout.Session, "retrieve", side_effect=AssertionError):
+            return self.client.get(reverse("payment_success"), {"session_id": order.stripe_session_id})
+
+    def test_webhook_fulfills_order_once(self):
+        order = self.checkout()
+        self.assertEqual(order.total, 50)
+        self.assertTrue(self.success_page(order).context["pending"])
+
+        self.stub.pay(order.stripe_session_id, "klient@example.com")
+        event = self.stub.events[0]
+        self.assertEqual(self.post_event(event).status_code, 200)
+        # Stripe może dostarczyć to samo zdarzenie ponownie
+        self.assertEqual(self.post_event(event).status_code, 200)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.FULFILLED)
+        self.assertEqual(order.email, "klient@example.com")
+        self.assertTrue(os.path.isfile(os.path.join(settings.MEDIA_ROOT, order.zip_file)))
+        self.assertEqual(len(mail.outbox), 1)
+
+        response = self.success_page(order)
+        self.assertFalse(response.context["pending"])
+        self.assertTrue(response.context["zip_url"].endswith(f"zamowienie_{order.token.hex}.zip"))
+
+    def test_recompute_stats_rebuilds_sales(self):
+        order = self.checkout()
+        self.stub.pay(order.stripe_session_id)
+        self.post_event(self.stub.events[0])
+        session_id = self.photos[0].session_id
+        SessionStats.objects.filter(pk=session_id).update(sales=0, photo_count=0)
+
+        call_command("recompute_session_stats", stdout=io.StringIO())
+        stats = SessionStats.objects.get(pk=session_id)
+        self.assertEqual((stats.photo_count, stats.sales), (2, 2))
+
+    def test_webhook_rejects_invalid_signature(self):
+        order = self.checkout()
+        self.stub.pay(order.stripe_session_id)
+        self.assertEqual(self.post_event(self.stub.events[0], secret="whsec_wrong").status_code, 400)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.PENDING)
+
+    def test_webhook_without_secret_fails_closed(self):
+        order = self.checkout()
+        self.stub.pay(order.stripe_session_id)
+        with override_settings(STRIPE_WEBHOOK_SECRET=None):
+            self.assertEqual(self.post_event(self.stub.events[0]).status_code, 500)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.PENDING)
+        self.assertEqual(mail.outbox, [])
+
+    def test_stale_fulfillment_claim_is_taken_over(self):
+        order = self.checkout()
+        self.stub.pay(order.stripe_session_id, "klient@example.com")
+        # Proces zginął po przejęciu zamówienia, przed zbudowaniem ZIP-a
+        Order.objects.filter(pk=order.pk).update(status=Order.FULFILLING, claimed_at=timezone.now())
+        self.assertEqual(self.post_event(self.stub.events[0]).status_code, 500)
+        self.assertEqual(mail.outbox, [])
+
+        lease = timedelta(seconds=settings.ORDER_FULFILLMENT_LEASE + 1)
+        Order.objects.filter(pk=order.pk).update(claimed_at=timezone.now() - lease)
+        self.assertEqual(self.post_event(self.stub.events[0]).status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.FULFILLED)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_unpaid_session_is_not_fulfilled(self):
+        order = self.checkout()
+        checkout_session = dict(self.stub.sessions[order.stripe_session_id])
+        event = stripe_stub.checkout_completed_event(checkout_session)
+        self.assertEqual(self.post_event(event).status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.PENDING)
+        self.assertEqual(mail.outbox, [])
+
+
+@override_settings(FILE_CLEANUP_IN_BACKGROUND=False)
+class GalleryManifestTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = Session.objects.create(name="Sesja manifest")
+        self.photo = Photo.objects.create(session=self.session, image=jpeg_upload("a.jpg", (10, 200, 10)), price=25)
+        self.url = reverse("gallery_manifest", args=[self.session.access_token])
+
+    def test_manifest_lists_photos_with_preview_urls(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        [item] = response.json()["photos"]
+        self.assertEqual(item["id"], self.photo.id)
+        self.assertEqual(item["price"], "25.00")
+        self.assertIn("jpeg", item["preview"])
+
+    def test_conditional_request_returns_304_until_content_changes(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.photo.price = 30
+        self.photo.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_preview_entry_without_formats(self):
+        # Manifest wersji pochodnych sprzed WebP/AVIF - tylko "name"
+        preview = dict(self.photo.renditions["preview"])
+        del preview["formats"]
+        Photo.objects.filter(pk=self.photo.pk).update(renditions={"preview": preview})
+
+        [item] = self.client.get(self.url).json()["photos"]
+        self.assertEqual(list(item["preview"]), ["jpeg"])
+        self.assertIn(preview["name"], item["preview"]["jpeg"])
+
+    def test_unknown_token_returns_404(self):
+        self.assertEqual(self.client.get(reverse("gallery_manifest", args=["brak"])).status_code, 404)
+
+    def test_gallery_links_manifest_urls(self):
+        response = self.client.get(reverse("gallery_view", args=[self.session.access_token]))
+        self.assertContains(response, self.photo.rendition_url(PREVIEW))
+        self.assertNotContains(response, self.photo.image.url)
+
+    def test_cached_grid_skips_photo_query(self):
+        gallery_url = reverse("gallery_view", args=[self.session.access_token])
+        self.client.get(gallery_url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertContains(self.client.get(gallery_url), self.photo.rendition_url(PREVIEW))
+        self.assertFalse([q["sql"] for q in ctx.captured_queries if 'FROM "fotoapp_photo"' in q["sql"]])
+
+    def test_upload_bumps_session_version_once(self):
+        version = Session.objects.get(pk=self.session.pk).content_version
+        Photo.objects.create(session=self.session, image=jpeg_upload("b.jpg", (10, 10, 10)), price=25)
+        self.assertEqual(Session.objects.get(pk=self.session.pk).content_version, version + 1)
+
+    def test_rebuilding_renditions_invalidates_manifest(self):
+        etag = self.client.get(self.url)["ETag"]
+        call_command("build_renditions", force=True, stdout=io.StringIO())
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.photo.refresh_from_db()
+        self.assertEqual(response.json()["photos"][0]["preview"]["jpeg"], self.photo.rendition_url(PREVIEW, "jpeg"))
+
+
+@override_settings(FILE_CLEANUP_IN_BACKGROUND=False)
+class FileCleanupTests(TempMediaMixin, TestCase):
+    def media_files(self):
+        # Bez plików blokad (fotoapp/locks.py) - to stałe paski, nie pliki zdjęć
+        return [
+            name for root, _, names in os.walk(settings.MEDIA_ROOT) for name in names
+            if os.path.basename(root) != LOCKS_ROOT
+        ]
+
+    def test_delete_journals_original_and_sweeper_removes_renditions(self):
+        session = Session.objects.create(name="Sesja sprzątanie")
+        photos = [
+            Photo.objects.create(session=session, image=jpeg_upload(f"{i}.jpg", (i * 90, 40, 40)), price=25)
+            for i in range(2)
+        ]
+        self.assertTrue(self.media_files())
+
+        Photo.objects.filter(session=session).delete()
+        # Jeden wpis na oryginał - nazwy wersji pochodnych wynikają z jego ścieżki
+        self.assertEqual(
+            sorted(FileCleanup.objects.values_list("path", flat=True)), sorted(p.image.name for p in photos)
+        )
+        cleanup.sweep_all()
+        self.assertEqual(self.media_files(), [])
+
+    def test_shared_original_keeps_renditions(self):
+        session = Session.objects.create(name="Sesja duplikaty")
+        first, second = (
+            Photo.objects.create(session=session, image=jpeg_upload("a.jpg", (10, 10, 200)), price=25)
+            for _ in range(2)
+        )
+        self.assertEqual(first.image.name, second.image.name)
+
+        first.delete()
+        cleanup.sweep_all()
+        self.assertTrue(os.path.exists(second.image.path))
+        preview = second.renditions[PREVIEW]["name"]
+        self.assertTrue(os.path.exists(os.path.join(settings.MEDIA_ROOT, preview)))
+
+
+@override_settings(FILE_CLEANUP_IN_BACKGROUND=False)
+class JanitorTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = Session.objects.create(name="Sesja janitor")
+        self.photo = Photo.objects.create(session=self.session, image=jpeg_upload("a.jpg", (90, 90, 10)), price=25)
+
+    def write(self, name, size, days_ago):
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        accessed = (timezone.now() - timedelta(days=days_ago)).timestamp()
+        os.utime(path, (accessed, accessed))
+        return path
+
+    def test_only_lazy_renditions_are_evicted(self):
+        thumb = rendition_name_for(self.photo.image.name, THUMB)
+        self.write(thumb, 100, days_ago=1)
+        version = Session.objects.get(pk=self.session.pk).content_version
+
+        janitor.scan("renditions")
+        victims = janitor.select_victims("renditions", {"max_bytes": 0})
+        self.assertEqual([path for path, _, _ in victims.values()], [thumb])
+
+        janitor.enforce("renditions", {"max_bytes": 0, "max_age_days": 0})
+        self.photo.refresh_from_db()
+        self.assertTrue(os.path.exists(os.path.join(settings.MEDIA_ROOT, self.photo.renditions[PREVIEW]["name"])))
+        self.assertEqual(Session.objects.get(pk=self.session.pk).content_version, version)
+
+    def test_least_recently_used_go_first(self):
+        other = Photo.objects.create(session=self.session, image=jpeg_upload("b.jpg", (10, 90, 90)), price=25)
+        old, recent = (rendition_name_for(p.image.name, THUMB) for p in (self.photo, other))
+        self.write(old, 100, days_ago=10)
+        self.write(recent, 100, days_ago=1)
+
+        janitor.scan("renditions")
+        victims = janitor.select_victims("renditions", {"max_bytes": 150})
+        self.assertEqual([path for path, _, _ in victims.values()], [old])
+        victims = janitor.select_victims("renditions", {"max_age_days": 5})
+        self.assertEqual([path for path, _, _ in victims.values()], [old])
+
+    def test_zips_in_download_period_are_kept(self):
+        names = []
+        for i, days_ago in enumerate((5, 60)):
+            name = f"{ZIPS_ROOT}/zamowienie_{i}.zip"
+            self.write(name, 100, days_ago=60)
+            Order.objects.create(
+                status=Order.FULFILLED, zip_file=name, fulfilled_at=timezone.now() - timedelta(days=days_ago)
+            )
+            names.append(name)
+
+        janitor.scan("zips")
+        victims = janitor.select_victims("zips", {"max_bytes": 0, "max_age_days": 30})
+        self.assertEqual([path for path, _, _ in victims.values()], names[1:])
+
+
+@override_settings(IMAGE_RENDER_WORKERS=0, FILE_CLEANUP_IN_BACKGROUND=False)
+class ServeImageFailureTests(TempMediaMixin, TestCase):
+    """Błąd renderowania miniatury nigdy nie może skończyć się wysłaniem oryginału."""
+
+    def setUp(self):
+        super().setUp()
+        self.session = Session.objects.create(name="Sesja miniatury")
+        self.photo = Photo.objects.create(session=self.session, image=jpeg_upload("a.jpg", (200, 10, 10)), price=25)
+        # Bez gotowych plików - widok musi renderować
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, RENDITIONS_ROOT))
+        self.url = reverse("serve_encrypted_image", args=[photo_token(self.photo)])
+
+    def get_with_render_error(self, error):
+        with mock.patch("fotoapp.views.render_rendition", side_effect=error):
+            return self.client.get(self.url)
+
+    def test_render_error_returns_500(self):
+        response = self.get_with_render_error(RuntimeError("uszkodzony plik"))
+        self.assertEqual(response.status_code, 500)
+        self.assertNotEqual(response.get("Content-Type"), "image/jpeg")
+
+    def test_gallery_without_manifest_links_signed_url(self):
+        # Zdjęcie sprzed manifestu: galeria nie renderuje podglądu sama i nie linkuje oryginału
+        Photo.objects.filter(pk=self.photo.pk).update(renditions={})
+        self.session.bump_content_version()
+        with mock.patch("fotoapp.renditions.build_renditions", side_effect=AssertionError):
+            response = self.client.get(reverse("gallery_view", args=[self.session.access_token]))
+        self.photo.refresh_from_db()
+        self.assertContains(response, reverse("serve_encrypted_image", args=[photo_token(self.photo, PREVIEW)]))
+        self.assertNotContains(response, self.photo.image.url)
+
+    def test_broken_pool_returns_503(self):
+        response = self.get_with_render_error(BrokenProcessPool())
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+
+
+class FormatNegotiationTests(TestCase):
+    def negotiate(self, accept=None):
+        headers = {"HTTP_ACCEPT": accept} if accept is not None else {}
+        return negotiate_format(RequestFactory().get("/", **headers), available=["jpeg", "webp"])
+
+    def test_prefers_supported_modern_format(self):
+        self.assertEqual(self.negotiate("image/avif,image/webp,*/*"), "webp")
+
+    def test_falls_back_to_jpeg(self):
+        self.assertEqual(self.negotiate("image/webp;q=0, */*"), "jpeg")
+        self.assertEqual(self.negotiate("image/avif"), "jpeg")
+        self.assertEqual(self.negotiate(), "jpeg")
+
+
+class SingleFlightTests(TempMediaMixin, TestCase):
+    def test_same_key_runs_one_at_a_time(self):
+        active, overlaps = [], []
+
+        def work(key):
+            with single_flight(key):
+                active.append(key)
+                overlaps.append(active.count(key))
+                time.sleep(0.01)
+                active.remove(key)
+
+        threads = [threading.Thread(target=work, args=(f"klucz-{i % 2}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(overlaps), 1)
+
+
+class PhotoTokenTests(TestCase):
+    def test_round_trip(self):
+        for photo_id, rendition, version in ((1, THUMB, 0), (123456, PREVIEW, 7), (36 ** 4, THUMB, 35)):
+            self.assertEqual(parse_token(make_token(photo_id, rendition, version)), (photo_id, rendition, version))
+
+    def test_signature_with_dash_round_trips(self):
+        # Podpis base64 urlsafe bywa z "-" - szukamy takiego tokenu
+        token = next(t for t in (make_token(i, THUMB) for i in range(1, 1000)) if "-" in t.split("-", 3)[3])
+        self.assertEqual(parse_token(token)[1], THUMB)
+
+    def test_tampered_tokens_are_rejected(self):
+        token = make_token(42, THUMB, 3)
+        photo_id, code, version, signature = token.split("-", 3)
+        other_id, _, other_version, _ = make_token(43, THUMB, 4).split("-", 3)
+        tampered = [
+            f"{other_id}-{code}-{version}-{signature}",
+            f"{photo_id}-p-{version}-{signature}",
+            f"{photo_id}-{code}-{other_version}-{signature}",
+            f"{photo_id}-{code}-{version}-{signature[:-1]}{'A' if signature[-1] != 'A' else 'B'}",
+            f"{photo_id}-{code}-{version}",
+            "zzz",
+        ]
+        for bad in tampered:
+            with self.assertRaises(BadToken, msg=bad):
+                parse_token(bad)
+        with override_settings(SECRET_KEY="inny-klucz"):
+            with self.assertRaises(BadToken):
+                parse_token(token)
+
+    def test_view_rejects_bad_signature_without_queries(self):
+        token = make_token(1, THUMB)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("serve_encrypted_image", args=[token[:-2] + "xx"]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(FILE_CLEANUP_IN_BACKGROUND=False)
+class SessionListTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user("admin", password="x"))
+        self.url = reverse("panel_sessions")
+
+    def test_cursor_pages_cover_every_session_once(self):
+        sessions = [Session.objects.create(name=f"Sesja {i}") for i in range(SESSIONS_PER_PAGE + 5)]
+        # Połowa z identycznym created_at - kolejność i kursor rozstrzyga id
+        Session.objects.filter(pk__in=[s.pk for s in sessions[::2]]).update(created_at=sessions[0].created_at)
+
+        seen, cursor = [], ""
+        while cursor is not None:
+            response = self.client.get(self.url, {"cursor": cursor} if cursor else {})
+            seen += [s.pk for s in response.context["sessions"]]
+            cursor = response.context["next_cursor"]
+        expected = Session.objects.order_by("-created_at", "-id").values_list("pk", flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_search_prefers_prefix_and_falls_back_to_substring(self):
+        Session.objects.create(name="Wesele Anny")
+        Session.objects.create(name="Chrzest Ani")
+
+        names = lambda q: [s.name for s in self.client.get(self.url, {"q": q}).context["sessions"]]
+        self.assertEqual(names("wes"), ["Wesele Anny"])
+        self.assertEqual(names("ann"), ["Wesele Anny"])
+        self.assertEqual(names("xyz"), [])
+
+    def test_cover_never_links_original(self):
+        session = Session.objects.create(name="Sesja okładka")
+        photo = Photo.objects.create(session=session, image=jpeg_upload("a.jpg", (30, 30, 200)), price=25)
+        session.cover_photo = photo
+        session.save()
+
+        response = self.client.get(self.url)
+        self.assertContains(response, photo.rendition_url(PREVIEW))
+        Photo.objects.filter(pk=photo.pk).update(renditions={})
+        photo.refresh_from_db()
+        response = self.client.get(self.url)
+        self.assertContains(response, reverse("serve_encrypted_image", args=[photo_token(photo, PREVIEW)]))
+        self.assertNotContains(response, photo.image.url)
+
+
+class EncodingProfileTests(TestCase):
+    def test_profile_without_format_applies_jpeg_options(self):
+        # Profil 'original' nie podaje formatu - opcje JPEG muszą wynikać z rozszerzenia pliku
+        from PIL import JpegImagePlugin
+        from . import encoding
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, "oryginal.jpg")
+        encoding.save(Image.new("RGB", (64, 48), (200, 30, 30)), path, "original")
+
+        with Image.open(path) as saved:
+            self.assertEqual(saved.format, "JPEG")
+            # 0 = 4:4:4 (bez podpróbkowania chrominancji)
+            self.assertEqual(JpegImagePlugin.get_sampling(saved), 0)
+            self.assertTrue(saved.info.get("progressive"))
+
+    def test_encode_uses_default_format_for_profile_without_format(self):
+        from . import encoding
+
+        data = encoding.encode(Image.new("RGB", (64, 48), (30, 200, 30)), "original", "JPEG")
+        with Image.open(io.BytesIO(data)) as encoded:
+            self.assertEqual(encoded.format, "JPEG")
+            self.assertTrue(encoded.info.get("progressive"))
+
+
+class LazyImportTests(TestCase):
+    def test_homepage_does_not_import_heavy_packages(self):
+        # Świeży interpreter - w procesie testów stripe i Pillow są już wczytane
+        # Pusta baza w pamięci - proces potomny nie może otwierać db.sqlite3 programisty
+        report = measure("/", database=":memory:")
+        self.assertEqual(report["status"], 200)
+        self.assertEqual(report["loaded"], [], f"Wczytano przy starcie: {report['loaded']} (z {LAZY_MODULES})")
@@ -0,0 +1,61 @@
+# fotoapp/tokens.py
+import base64
+from django.utils.crypto import constant_time_compare, salted_hmac
+from .renditions import PREVIEW, THUMB
+
+# Krótkie, podpisane tokeny obrazów: <id zdjęcia>-<wersja pochodna>-<wersja>-<podpis>,
+# liczby w base36, podpis HMAC-SHA256 (SECRET_KEY) skrócony do 12 bajtów.
+# Token nie zawiera ścieżki pliku, więc nie zmienia się po przeniesieniu plików,
+# a zły podpis odrzucamy bez zapytania do bazy i bez dotykania dysku.
+KEY_SALT = "fotoapp.tokens.image"
+SIGNATURE_BYTES = 12
+
+RENDITION_CODES = {THUMB: "t", PREVIEW: "p"}
+RENDITIONS_BY_CODE = {code: name for name, code in RENDITION_CODES.items()}
+
+
+class BadToken(Exception):
+    pass
+
+
+def _base36(number):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    result = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        result = digits[remainder] + result
+        if not number:
+            return result
+
+
+def _signature(payload):
+    digest = salted_hmac(KEY_SALT, payload, algorithm="sha256").digest()[:SIGNATURE_BYTES]
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def rendition_version(photo, rendition):
+    """Wersja z manifestu - zmienia URL (i klucz cache CDN) po przegenerowaniu zdjęcia."""
+    manifest = photo.renditions or {}
+    return (manifest.get(rendition) or manifest.get(PREVIEW) or {}).get("version", 0)
+
+
+def make_token(photo_id, rendition, version=0):
+    payload = f"{_base36(photo_id)}-{RENDITION_CODES[rendition]}-{_base36(version)}"
+    return f"{payload}-{_signature(payload)}"
+
+
+def photo_token(photo, rendition=THUMB):
+    return make_token(photo.pk, rendition, rendition_version(photo, rendition))
+
+
+def parse_token(token):
+    """Zwraca (id zdjęcia, wersja pochodna, wersja) albo rzuca BadToken."""
+    try:
+        # Podpis (base64 urlsafe) może sam zawierać "-" - dzielimy tylko na cztery części
+        photo_id, code, version, signature = token.split("-", 3)
+        payload = f"{photo_id}-{code}-{version}"
+        if not constant_time_compare(signature, _signature(payload)):
+            raise BadToken("Nieprawidłowy podpis")
+        return int(photo_id, 36), RENDITIONS_BY_CODE[code], int(version, 36)
+    except (ValueError, KeyError) as e:
+        raise BadToken(str(e))
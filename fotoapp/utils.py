@@ -1,26 +1,8 @@
 # fotoapp/utils.py
 import os
 import traceback
-import base64
 from django.conf import settings
-from PIL import Image, ImageDraw, ImageFont
-
-# ==========================================
-# CZĘŚĆ 1: SZYFROWANIE ŚCIEŻEK
-# ==========================================
-
-def encrypt_path(path):
-    """
-    Koduje ścieżkę do formatu bezpiecznego dla URL (base64).
-    """
-    return base64.urlsafe_b64encode(path.encode()).decode()
-
-def decrypt_path(encoded_path):
-    """
-    Odkodowuje ścieżkę z URL.
-    """
-    return base64.urlsafe_b64decode(encoded_path.encode()).decode()
-
+from . import encoding, watermarking
 
 # ==========================================
 # WATERMARK + ZAPIS!!
@@ -53,6 +35,8 @@ def save_photos(uploaded_file, filename):
     watermarked_path = os.path.join(watermarked_dir, filename)
 
     try:
+        from PIL import Image
+
         # 3. Otwieramy i zapisujemy ORYGINAŁ
         image = Image.open(uploaded_file)
         
@@ -60,38 +44,14 @@ def save_photos(uploaded_file, filename):
         if image.mode in ("RGBA", "P"):
             image = image.convert("RGB")
         
-        image.save(original_path, quality=100)
+        encoding.save(image, original_path, 'original')
         print(f"--> Zapisano oryginał: {original_path}")
 
-        # 4. Tworzymy WATERMARK
-        wm_image = image.copy().convert("RGBA")
-        
-        txt_layer = Image.new("RGBA", wm_image.size, (255, 255, 255, 0))
-        draw = ImageDraw.Draw(txt_layer)
-        
-        # Tekst i font (w przypadku braku logo)
-        text = "FOTOAPP DEMO"
-        font = ImageFont.load_default() 
-        
-        # Obliczanie pozycji
-        width, height = wm_image.size
-        try:
-            bbox = draw.textbbox((0, 0), text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-        except AttributeError:
-            text_width, text_height = draw.textsize(text, font=font)
-        
-        x = (width - text_width) / 2
-        y = (height - text_height) / 2
-
-        draw.text((x, y), text, fill=(255, 255, 255, 128), font=font)
-        
-        final_wm = Image.alpha_composite(wm_image, txt_layer)
-        final_wm = final_wm.convert("RGB")
+        # 4. Tworzymy WATERMARK (napis - wspólny silnik znaków wodnych)
+        final_wm = watermarking.apply(image, "demo")
 
         # 5. Zapisujemy WATERMARK
-        final_wm.save(watermarked_path, quality=85)
+        encoding.save(final_wm, watermarked_path, 'preview')
         print(f"--> Zapisano watermark: {watermarked_path}")
         
         print("--- SUKCES ---")
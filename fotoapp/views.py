@@ -1,30 +1,53 @@
 # fotoapp/views.py
 
+import asyncio
+import json
 import os
-import zipfile
-import stripe
-import io
-from PIL import Image, ImageEnhance # Do obróbki zdjęć
-from django.contrib.staticfiles import finders # Do szukania logo
+from collections import Counter
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import FileResponse, Http404, HttpResponseForbidden, JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_POST
 from django.conf import settings
 from django.urls import reverse
-from django.core.mail import send_mail
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.core.files.storage import default_storage
 from .models.session import Session
 from .models.photo import Photo
-from .utils import decrypt_path, encrypt_path
+from .models.stats import increment_stats
+from .models.order import Order
+from .janitor import record_access
+from .orders import create_order, ensure_zip, fulfill, mark_paid
+from .tokens import BadToken, parse_token, photo_token, rendition_version
+from .admission import Saturated, get_controller, render_rendition
+from .sprites import current_manifest, schedule_build
+from .renditions import FORMATS, PREVIEW, THUMB, negotiate_format, rendition_name_for, rendition_url
 from .cart import (
     add as cart_add,
     remove as cart_remove,
+    set_qty as cart_set_qty,
     count as cart_count,
-    _cart as get_cart
+    peek as peek_cart,
+    load as load_cart_session,
 )
 
-# Konfiguracja Stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
+@lru_cache(maxsize=None)
+def get_stripe():
+    """
+    Klient Stripe wczytywany przy pierwszej płatności - import pakietu stripe jest
+    kosztowny, a większość żądań (strony, galeria, koszyk) go nie potrzebuje.
+    """
+    import stripe
+
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    if settings.STRIPE_API_BASE:
+        stripe.api_base = settings.STRIPE_API_BASE
+    return stripe
 
 # ===============================
 #         STRONY GŁÓWNE
@@ -60,141 +83,251 @@ def check_password(request):
 # ===============================
 
 def gallery_view(request, access_token):
+    session = get_object_or_404(Session.objects.select_related("stats"), access_token=access_token)
+    # Tylko pola potrzebne do zbudowania URL-i z manifestu - jedno zapytanie, zero operacji na dysku
+    photos = (
+        session.photos.select_related("metadata")
+        .only("id", "session", "image", "renditions", "placeholder", "metadata__width", "metadata__height")
+        .by_capture_time()
+    )
+    # Zapis tylko przy pierwszej wizycie - ponowne ustawienie tej samej wartości
+    # oznaczałoby sesję jako zmienioną i zapis do django_session przy każdym odświeżeniu
+    if not request.session.get('gallery_access'):
+        request.session['gallery_access'] = True
+    record_access(session_id=session.pk)
+    # Arkusze miniatur dla bieżącej wersji - jeśli ich nie ma, siatka używa osobnych obrazów,
+    # a arkusze powstają w tle na kolejne odsłony
+    sprites = current_manifest(session)
+    if sprites is None:
+        schedule_build(session)
+    # Siatka jest cache'owana pod session.content_version - przy trafieniu zapytanie o zdjęcia nie jest wykonywane
+    response = render(request, 'fotoapp/gallery.html', {
+        'session': session,
+        'photos': photos,
+        'cache_timeout': settings.GALLERY_CACHE_TIMEOUT,
+        'image_format': negotiate_format(request),
+        'sprites': sprites,
+    })
+    # Format obrazów w HTML zależy od nagłówka Accept
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+# Zmiana struktury odpowiedzi musi zmienić ETag, nawet jeśli zawartość sesji jest ta sama.
+GALLERY_MANIFEST_SCHEMA = 1
+
+
+def gallery_manifest_etag(request, access_token):
+    row = Session.objects.filter(access_token=access_token).values_list("pk", "content_version").first()
+    if row is None:
+        return None
+    # Silny ETag: content_version rośnie przy każdej zmianie zdjęć, cen i wersji pochodnych
+    return f"gallery-{row[0]}-{row[1]}-{GALLERY_MANIFEST_SCHEMA}"
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=gallery_manifest_etag)
+def gallery_manifest(request, access_token):
+    """
+    Manifest galerii w JSON (front-end, kiosk): zdjęcia z cenami, wymiarami i URL-ami
+    podglądu we wszystkich formatach. Klient odświeża go warunkowo (If-None-Match) -
+    przy niezmienionej sesji odpowiedź 304 kosztuje jedno zapytanie o dwie kolumny.
+    """
     session = get_object_or_404(Session, access_token=access_token)
-    photos = session.photos.all()
-    request.session['gallery_access'] = True
+    record_access(session_id=session.pk)
+    photos = (
+        session.photos.select_related("metadata")
+        .only("id", "session", "image", "price", "renditions", "metadata__width", "metadata__height")
+        .by_capture_time()
+    )
+
+    items = []
     for photo in photos:
-        photo.token = encrypt_path(photo.image.name)
-    return render(request, 'fotoapp/gallery.html', {'session': session, 'photos': photos})
+        preview = (photo.renditions or {}).get(PREVIEW)
+        metadata = getattr(photo, "metadata", None)
+        items.append({
+            "id": photo.id,
+            "price": str(photo.price),
+            "width": preview["width"] if preview else getattr(metadata, "width", None),
+            "height": preview["height"] if preview else getattr(metadata, "height", None),
+            # Wpisy sprzed WebP/AVIF nie mają "formats" - tylko JPEG pod "name"
+            "preview": {
+                image_format: rendition_url(preview, image_format)
+                for image_format in preview.get("formats") or {"jpeg": preview["name"]}
+            } if preview else {},
+        })
+
+    return JsonResponse({
+        "session": {"id": session.id, "name": session.name, "version": session.content_version},
+        "photos": items,
+    })
 
 
-def serve_encrypted_image(request, token):
+async def serve_encrypted_image(request, token):
     """
     Serwuje obraz z SIATKĄ ZNAKÓW WODNYCH (Tiled Watermark).
     Używane w koszyku, aby zabezpieczyć miniatury.
+    Widok asynchroniczny: renderowanie trafia do ograniczonej puli procesów
+    (fotoapp/admission.py), więc nie blokuje wątków obsługujących koszyk i płatności.
+    Token (fotoapp/tokens.py) wskazuje zdjęcie po ID - podpis sprawdzamy przed
+    zapytaniem do bazy, a dysk czytamy dopiero dla istniejącego zdjęcia.
     """
     try:
-        # Sprawdzanie uprawnień sesji (zalecane)
-        if not request.session.get('gallery_access'):
-             # Jeśli koszyk ma działać po wygaśnięciu sesji galerii, można to zakomentować
-             pass 
-            
-        path = decrypt_path(token)
-        full_path = os.path.join(settings.MEDIA_ROOT, path)
-        
-        if not os.path.isfile(full_path):
-            raise FileNotFoundError
+        photo_id, rendition, version = parse_token(token)
+    except BadToken:
+        raise Http404("Błędny token lub plik nie istnieje")
 
-        # --- GENEROWANIE SIATKI ZNAKÓW WODNYCH ---
+    photo = await Photo.objects.only("id", "image", "renditions").filter(pk=photo_id).afirst()
+    if photo is None:
+        raise Http404("Błędny token lub plik nie istnieje")
+    path = photo.image.name
+
+    # --- SIATKA ZNAKÓW WODNYCH ---
+    # Wspólny silnik (fotoapp/watermarking.py); wynik jest zapisywany na dysku,
+    # więc kolejne żądania o tę samą miniaturę tylko odczytują gotowy plik.
+    image_format = negotiate_format(request)
+    name = rendition_name_for(path, rendition, image_format)
+    if not await asyncio.to_thread(os.path.exists, os.path.join(settings.MEDIA_ROOT, name)):
         try:
-            # 1. Otwórz zdjęcie główne
-            base_image = Image.open(full_path).convert("RGBA")
-            
-            # 2. Znajdź logo (używamy tego samego co na stronie)
-            watermark_path = finders.find('images/logo.png') 
-            
-            if watermark_path:
-                watermark = Image.open(watermark_path).convert("RGBA")
-                
-                # 3. Zmniejsz logo (do kafelkowania - np. 15% szerokości zdjęcia)
-                scale_factor = 0.15 
-                wm_width = int(base_image.width * scale_factor)
-                wm_ratio = watermark.height / watermark.width
-                wm_height = int(wm_width * wm_ratio)
-                
-                # Resize
-                watermark = watermark.resize((wm_width, wm_height), Image.Resampling.LANCZOS)
-                
-                # 4. Zmniejsz przezroczystość logo (żeby nie było zbyt nachalne)
-                alpha = watermark.split()[3]
-                alpha = ImageEnhance.Brightness(alpha).enhance(0.3) # 0.3 = 30% widoczności
-                watermark.putalpha(alpha)
-
-                # 5. PĘTLA KAFELKOWANIA (Tiling)
-                # Obliczamy odstępy (logo + odstęp)
-                step_x = int(wm_width * 1.5)
-                step_y = int(wm_height * 1.5)
-                
-                # Przesunięcie startowe
-                start_x = int(step_x * 0.5)
-                start_y = int(step_y * 0.5)
-
-                # Iterujemy po całym obrazku
-                for y in range(0, base_image.height, step_y):
-                    for x in range(0, base_image.width, step_x):
-                        # Przesunięcie co drugi rząd (efekt cegieł)
-                        offset_x = 0
-                        if (y // step_y) % 2 == 1:
-                            offset_x = int(step_x / 2)
-                            
-                        # Pozycja wklejenia
-                        pos_x = x + offset_x
-                        pos_y = y
-                        
-                        # Wklejamy logo
-                        base_image.paste(watermark, (pos_x, pos_y), watermark)
-
-            # 6. Konwersja i zapis do pamięci
-            rgb_image = base_image.convert("RGB")
-            buffer = io.BytesIO()
-            # Quality 80 jest wystarczające dla miniatur w koszyku
-            rgb_image.save(buffer, format="JPEG", quality=80) 
-            buffer.seek(0)
-            
-            return FileResponse(buffer, content_type='image/jpeg')
-
+            await get_controller().run(render_rendition, path, rendition, image_format)
+        except (Saturated, BrokenProcessPool):
+            # Pula i kolejka pełne albo proces puli zginął - szybka odmowa, klient spróbuje ponownie
+            response = HttpResponse("Serwer jest przeciążony, spróbuj ponownie.", status=503)
+            response['Retry-After'] = str(settings.IMAGE_RENDER_RETRY_AFTER)
+            return response
+        except FileNotFoundError:
+            raise Http404("Błędny token lub plik nie istnieje")
         except Exception as e:
-            # Fallback w razie błędu graficznego - wyślij oryginał
+            # Nigdy nie wysyłamy oryginału - bez znaku wodnego zdjęcie byłoby za darmo
             print(f"Watermark Error: {e}")
-            return FileResponse(open(full_path, 'rb'), content_type='image/jpeg')
+            return HttpResponse("Nie udało się przygotować podglądu.", status=500)
+
+    await sync_to_async(record_access)([name])
+    # Miniatury są małe - czytamy całość w wątku zamiast strumieniować synchronicznym iteratorem
+    data = await asyncio.to_thread(read_file, os.path.join(settings.MEDIA_ROOT, name))
+    response = HttpResponse(data, content_type=FORMATS[image_format][1])
+    patch_vary_headers(response, ['Accept'])
+    # URL zawiera wersję, więc aktualny plik może być cache'owany (także przez CDN) bez końca
+    if version == rendition_version(photo, rendition):
+        patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    return response
 
-    except Exception:
-        raise Http404("Błędny token lub plik nie istnieje")
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
 
 
 # ===============================
 #         API KOSZYKA
 # ===============================
 
+# Widoki asynchroniczne - sesja jest wczytywana przez load_cart_session(), a zapisywana
+# przez SessionMiddleware, tak jak w widokach synchronicznych.
+
 @require_POST
-def api_cart_add(request, photo_id: int):
+async def api_cart_add(request, photo_id: int):
     try:
-        p = Photo.objects.get(pk=photo_id)
+        p = await Photo.objects.only("id", "session", "price").aget(pk=photo_id)
     except Photo.DoesNotExist:
         raise Http404("Photo not found")
 
+    await load_cart_session(request)
     cart_add(request, photo_id=p.id, price=p.price, qty=1)
+    await sync_to_async(increment_stats)(p.session_id, cart_adds=1)
     return JsonResponse({"ok": True, "count": cart_count(request)})
 
 
 @require_POST
-def api_cart_remove(request, photo_id: int):
-    try:
-        p = Photo.objects.get(pk=photo_id)
-    except Photo.DoesNotExist:
+async def api_cart_remove(request, photo_id: int):
+    if not await Photo.objects.filter(pk=photo_id).aexists():
         raise Http404("Photo not found")
 
-    cart_remove(request, photo_id=p.id, qty=1)
+    await load_cart_session(request)
+    cart_remove(request, photo_id=photo_id, qty=1)
     return JsonResponse({"ok": True, "count": cart_count(request)})
 
 
 @require_POST
-def api_cart_delete(request, photo_id: int):
-    cart = get_cart(request)
-    cart.pop(str(photo_id), None)
-    request.session.modified = True
+async def api_cart_delete(request, photo_id: int):
+    await load_cart_session(request)
+    cart = peek_cart(request)
+    if cart.pop(str(photo_id), None) is not None:
+        request.session.modified = True
     return JsonResponse({"ok": True, "count": cart_count(request)})
 
 
-def api_cart_summary(request):
-    cart = get_cart(request)
+# Operacje zbiorczego endpointu koszyka i limit operacji w jednym żądaniu
+CART_BATCH_OPS = ("add", "remove", "set")
+CART_BATCH_LIMIT = 1000
+# Zakres INTEGER w bazie - większe ID i ilości kończyłyby się OverflowError (500)
+CART_BATCH_MAX_INT = 2 ** 63 - 1
+
+
+@require_POST
+async def api_cart_batch(request):
+    """
+    Wiele zmian koszyka w jednym żądaniu, np. zaznaczenie całej galerii:
+    {"ops": [{"op": "add" | "remove" | "set", "id": 12, "qty": 1}, ...]}
+    Zdjęcia (ceny) pobiera jedno zapytanie id__in, sesja jest zapisywana raz, a odpowiedź
+    zawiera od razu podsumowanie koszyka - bez osobnego api_cart_summary.
+    """
+    try:
+        ops = [(op["op"], int(op["id"]), int(op.get("qty", 1))) for op in json.loads(request.body)["ops"]]
+    except (ValueError, KeyError, TypeError, OverflowError):
+        return JsonResponse({"ok": False, "error": "Nieprawidłowe dane"}, status=400)
+    if len(ops) > CART_BATCH_LIMIT or any(
+        kind not in CART_BATCH_OPS or not 0 < pid <= CART_BATCH_MAX_INT
+        or not (0 if kind == "set" else 1) <= qty <= CART_BATCH_MAX_INT
+        for kind, pid, qty in ops
+    ):
+        return JsonResponse({"ok": False, "error": "Nieprawidłowe operacje"}, status=400)
+
+    await load_cart_session(request)
+    # Jedno zapytanie dla zdjęć z operacji i tych, które już są w koszyku (do podsumowania)
+    ids = {pid for _, pid, _ in ops} | {int(pid) for pid in peek_cart(request)}
+    photos_map = {
+        p.id: p async for p in Photo.objects.filter(id__in=ids).only("id", "session", "price", "renditions")
+    }
+
+    missing, added = [], Counter()
+    for kind, pid, qty in ops:
+        p = photos_map.get(pid)
+        before = peek_cart(request).get(str(pid), {}).get("qty", 0)
+        if p is None:
+            # Zdjęcie usunięte po dodaniu do koszyka - stary wpis nie może zawyżać licznika
+            if before:
+                cart_set_qty(request, photo_id=pid, qty=0, price=0)
+            missing.append(pid)
+            continue
+        if kind == "remove":
+            cart_remove(request, photo_id=pid, qty=qty)
+            continue
+        if kind == "add":
+            cart_add(request, photo_id=pid, price=p.price, qty=qty)
+        elif qty != before:
+            cart_set_qty(request, photo_id=pid, qty=qty, price=p.price)
+        added[p.session_id] += max(0, qty if kind == "add" else qty - before)
+
+    for session_id, n in added.items():
+        if n:
+            await sync_to_async(increment_stats)(session_id, cart_adds=n)
+    return JsonResponse({**cart_summary(request, peek_cart(request), photos_map), "missing": missing})
+
+
+async def api_cart_summary(request):
+    await load_cart_session(request)
+    cart = peek_cart(request)
     if not cart:
-        return JsonResponse({"ok": True, "items": [], "total": "0.00", "count": 0})
+        return JsonResponse(cart_summary(request, cart, {}))
 
     ids = [int(pid) for pid in cart.keys()]
-    photos = Photo.objects.filter(id__in=ids)
-    photos_map = {p.id: p for p in photos}
+    photos_map = {p.id: p async for p in Photo.objects.filter(id__in=ids).only("id", "renditions")}
+    return JsonResponse(cart_summary(request, cart, photos_map))
 
+
+def cart_summary(request, cart, photos_map):
+    """Pozycje koszyka z miniaturami; photos_map musi zawierać zdjęcia z koszyka."""
     items = []
     total = 0.0
 
@@ -208,10 +341,9 @@ def api_cart_summary(request):
         line_total = qty * price
         total += line_total
 
-        # Token do obrazka z watermarkiem
-        token = encrypt_path(p.image.name)
+        # Podpisany token miniatury z watermarkiem
         thumb_url = request.build_absolute_uri(
-            reverse("serve_encrypted_image", args=[token])
+            reverse("serve_encrypted_image", args=[photo_token(p, THUMB)])
         )
 
         items.append({
@@ -222,16 +354,16 @@ def api_cart_summary(request):
             "thumb": thumb_url,
         })
 
-    return JsonResponse({
+    return {
         "ok": True,
         "items": items,
         "total": f"{total:.2f}",
         "count": sum(i["qty"] for i in cart.values()),
-    })
+    }
 
 
 def cart_view(request):
-    return render(request, "cart/view.html", {"cart": get_cart(request)})
+    return render(request, "cart/view.html", {"cart": peek_cart(request)})
 
 
 # ===============================
@@ -239,7 +371,7 @@ def cart_view(request):
 # ===============================
 
 def create_checkout_session(request):
-    cart = get_cart(request)
+    cart = peek_cart(request)
     if not cart:
         return redirect('home')
 
@@ -274,84 +406,101 @@ def create_checkout_session(request):
     if not line_items:
         return redirect('home')
 
+    # Zamówienie powstaje przed płatnością - realizacja nie zależy już od koszyka w sesji
+    order = create_order(cart, photos_map)
+
     try:
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = get_stripe().checkout.Session.create(
             payment_method_types=['card', 'blik'],
             line_items=line_items,
             mode='payment',
+            client_reference_id=str(order.pk),
+            metadata={'order_id': order.pk},
             success_url=f"{domain}{reverse('payment_success')}?session_id={{CHECKOUT_SESSION_ID}}",
             cancel_url=f"{domain}{reverse('home')}",
         )
+        order.stripe_session_id = checkout_session.id
+        order.save(update_fields=['stripe_session_id'])
         return redirect(checkout_session.url, code=303)
     except Exception as e:
+        order.delete()
         return JsonResponse({'error': f"Stripe Error: {str(e)}"})
 
 
 def payment_success(request):
+    """
+    Strona po powrocie ze Stripe. Czyta tylko stan zamówienia w bazie - płatność
+    zapisuje i realizuje webhook (stripe_webhook), więc klient nie czeka na API Stripe.
+    """
     session_id = request.GET.get('session_id')
-    customer_email = None
+    order = Order.objects.filter(stripe_session_id=session_id).first() if session_id else None
+    if order is None:
+        return render(request, 'fotoapp/homepage.html', {'error': 'Nie znaleziono zamówienia.'})
 
-    if session_id:
+    zip_url = None
+    if order.status == Order.FULFILLED:
         try:
-            session_details = stripe.checkout.Session.retrieve(session_id)
-            if session_details.customer_details:
-                customer_email = session_details.customer_details.email
+            zip_url = default_storage.url(ensure_zip(order))
+            record_access([order.zip_file])
         except Exception as e:
-            print(f"Błąd pobierania danych ze Stripe: {e}")
+            print(f"Błąd archiwum zamówienia {order.pk}: {e}")
 
-    cart = get_cart(request)
-    if not cart:
-        return render(request, 'fotoapp/homepage.html', {'error': 'Sesja wygasła lub koszyk jest pusty.'})
+    # Koszyk czyścimy tylko raz - kolejne odświeżenia nie zapisują sesji
+    if order.status != Order.PENDING and peek_cart(request):
+        request.session['cart'] = {}
+        request.session.modified = True
 
-    ids = [int(pid) for pid in cart.keys()]
-    photos = Photo.objects.filter(id__in=ids)
-
-    if not photos.exists():
-        return redirect('home')
+    context = {
+        'order': order,
+        'pending': order.status != Order.FULFILLED,
+        'zip_url': zip_url,
+        'count': order.items.count(),
+        'email': order.email or None,
+        'email_error': bool(order.email) and order.status == Order.FULFILLED and not order.email_sent,
+    }
+    return render(request, 'fotoapp/success.html', context)
 
-    zip_dir = os.path.join(settings.MEDIA_ROOT, 'zips')
-    if not os.path.exists(zip_dir):
-        os.makedirs(zip_dir)
 
-    session_key = request.session.session_key or 'unknown'
-    zip_filename = f"zamowienie_{session_key[:8]}.zip"
-    zip_filepath = os.path.join(zip_dir, zip_filename)
-    
-    zip_relative_url = f"{settings.MEDIA_URL}zips/{zip_filename}"
-    zip_absolute_url = request.build_absolute_uri(zip_relative_url)
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """
+    Zdarzenia Stripe (podpis weryfikowany sekretem STRIPE_WEBHOOK_SECRET).
+    checkout.session.completed z opłaconą sesją zapisuje płatność i realizuje zamówienie.
+    Stripe ponawia dostarczenie, dopóki nie dostanie 2xx - realizacja jest idempotentna.
+    """
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        # Bez sekretu nie da się odróżnić zdarzeń Stripe od podrobionych
+        print("Brak STRIPE_WEBHOOK_SECRET - zdarzenie Stripe odrzucone")
+        return HttpResponse(status=500)
 
-    # ZIPUJEMY ORYGINAŁY
+    stripe = get_stripe()
     try:
-        with zipfile.ZipFile(zip_filepath, 'w', compression=zipfile.ZIP_STORED) as zip_file:
-            for photo in photos:
-                original_path = photo.image.path 
-                if os.path.exists(original_path):
-                    zip_file.write(original_path, arcname=os.path.basename(original_path))
-    except Exception as e:
-        return render(request, 'fotoapp/homepage.html', {'error': 'Wystąpił błąd podczas generowania plików (ZIP).'})
+        event = stripe.Webhook.construct_event(
+            request.body, request.headers.get('Stripe-Signature', ''), settings.STRIPE_WEBHOOK_SECRET
+        )
+    except (ValueError, stripe.SignatureVerificationError):
+        return HttpResponse(status=400)
 
-    # WYSYŁKA MAILA
-    email_sent = False
-    if customer_email:
-        try:
-            send_mail(
-                subject='Twoje zdjęcia - Kilar Fotografia',
-                message=f'Dziękujemy za zakup!\n\nTwoje zdjęcia są gotowe do pobrania pod tym linkiem:\n{zip_absolute_url}\n\nPozdrawiamy,\nZespół Kilar Fotografia',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[customer_email],
-                fail_silently=False,
-            )
-            email_sent = True
-        except Exception as e:
-            print(f"Błąd wysyłki maila: {e}")
+    if event['type'] not in ('checkout.session.completed', 'checkout.session.async_payment_succeeded'):
+        return HttpResponse(status=200)
 
-    request.session['cart'] = {}
-    request.session.modified = True
+    checkout_session = event['data']['object']
+    order = Order.objects.filter(stripe_session_id=checkout_session['id']).first()
+    if order is None or checkout_session.get('payment_status') != 'paid':
+        # Nieznane zamówienie albo płatność odroczona (BLIK) - czekamy na kolejne zdarzenie
+        return HttpResponse(status=200)
 
-    context = {
-        'zip_url': zip_relative_url,
-        'count': photos.count(),
-        'email': customer_email,
-        'email_error': not email_sent and customer_email is not None
-    }
-    return render(request, 'fotoapp/success.html', context)
\ No newline at end of file
+    customer = checkout_session.get('customer_details') or {}
+    order = mark_paid(order, customer.get('email') or "")
+    try:
+        fulfill(order, lambda name: request.build_absolute_uri(default_storage.url(name)))
+    except Exception as e:
+        print(f"Błąd realizacji zamówienia {order.pk}: {e}")
+        # 500 - Stripe ponowi zdarzenie później
+        return HttpResponse(status=500)
+    if order.status != Order.FULFILLED:
+        # Realizację prowadzi inna próba (albo proces zginął w trakcie) - 500, żeby Stripe
+        # ponowił zdarzenie; po ORDER_FULFILLMENT_LEASE ponowienie przejmie zamówienie
+        return HttpResponse(status=500)
+    return HttpResponse(status=200)
@@ -0,0 +1,142 @@
+# fotoapp/watermarking.py
+import os
+from functools import lru_cache
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+# Jedyny silnik znaków wodnych w aplikacji. Wygląd opisują nazwane style (STYLES) złożone
+# z układu (gdzie i jak duże jest logo) i zasobu (plik logo lub tekst). Wszystkie miejsca
+# w kodzie korzystają z apply()/render(), więc optymalizacje robimy tylko tutaj.
+# Pillow jest importowany w funkcjach - moduł wczytują też widoki, które nic nie renderują.
+
+
+# ==========================================
+# ZASOBY
+# ==========================================
+
+@lru_cache(maxsize=16)
+def load_asset(name, opacity):
+    """
+    Wczytuje logo (szukane przez staticfiles, potem w BASE_DIR/static) jako RGBA
+    z przemnożoną przezroczystością. Wynik jest cache'owany w pamięci procesu.
+    """
+    from PIL import Image
+
+    path = finders.find(name) or os.path.join(settings.BASE_DIR, 'static', name)
+    asset = Image.open(path).convert("RGBA")
+    if opacity < 1:
+        alpha = asset.getchannel("A").point(lambda p: int(p * opacity))
+        asset.putalpha(alpha)
+    return asset
+
+
+@lru_cache(maxsize=64)
+def scaled_asset(name, opacity, width):
+    """Logo przeskalowane do zadanej szerokości (z zachowaniem proporcji)."""
+    from PIL import Image
+
+    asset = load_asset(name, opacity)
+    height = max(1, int(width * asset.height / asset.width))
+    return asset.resize((max(1, width), height), Image.Resampling.LANCZOS)
+
+
+def composite(base, tile, x, y):
+    """Nakłada kafelek na obraz RGBA w miejscu; fragmenty poza lewą/górną krawędzią są przycinane."""
+    left, top = max(0, -x), max(0, -y)
+    if left < tile.width and top < tile.height:
+        base.alpha_composite(tile, dest=(x + left, y + top), source=(left, top))
+
+
+# ==========================================
+# UKŁADY
+# ==========================================
+
+# Układy rysują bezpośrednio na zdjęciu (RGBA). W pamięci zostaje tylko przeskalowane logo
+# (scaled_asset), nie warstwa wielkości zdjęcia.
+
+class CenteredLayout:
+    """Jedno logo na środku zdjęcia."""
+
+    def __init__(self, asset, scale, opacity=1.0):
+        self.asset, self.scale, self.opacity = asset, scale, opacity
+
+    def draw(self, base):
+        tile = scaled_asset(self.asset, self.opacity, int(base.width * self.scale))
+        composite(base, tile, (base.width - tile.width) // 2, (base.height - tile.height) // 2)
+
+
+class TiledLayout:
+    """
+    Siatka logo w układzie cegły (co drugi rząd przesunięty o pół kroku).
+    Odstęp podajemy w pikselach (spacing) albo jako ułamek rozmiaru kafelka (spacing_ratio).
+    """
+
+    def __init__(self, asset, scale, opacity, spacing=0, spacing_ratio=0.0):
+        self.asset, self.scale, self.opacity = asset, scale, opacity
+        self.spacing, self.spacing_ratio = spacing, spacing_ratio
+
+    def draw(self, base):
+        tile = scaled_asset(self.asset, self.opacity, int(base.width * self.scale))
+        step_x = tile.width + self.spacing + int(tile.width * self.spacing_ratio)
+        step_y = tile.height + self.spacing + int(tile.height * self.spacing_ratio)
+
+        for row, y in enumerate(range(0, base.height, step_y)):
+            # Przesunięte rzędy zaczynamy pół kroku przed krawędzią, żeby nie zostawić luki po lewej
+            start_x = -(step_x // 2) if row % 2 else 0
+            for x in range(start_x, base.width, step_x):
+                composite(base, tile, x, y)
+
+
+class TextLayout:
+    """Półprzezroczysty napis na środku zdjęcia (gdy nie ma logo)."""
+
+    def __init__(self, text, fill=(255, 255, 255, 128)):
+        self.text, self.fill = text, fill
+
+    def draw(self, base):
+        from PIL import Image, ImageDraw, ImageFont
+
+        font = ImageFont.load_default()
+        left, top, right, bottom = ImageDraw.Draw(base).textbbox((0, 0), self.text, font=font)
+        x = (base.width - (right - left)) / 2
+        y = (base.height - (bottom - top)) / 2
+        # Napis na warstwie wielkości napisu (nie zdjęcia), nakładanej jak logo
+        ox, oy = int(x), int(y)
+        layer = Image.new("RGBA", (right + 2, bottom + 2), (0, 0, 0, 0))
+        ImageDraw.Draw(layer).text((x - ox, y - oy), self.text, fill=self.fill, font=font)
+        composite(base, layer, ox, oy)
+
+
+# Nazwy stylów odpowiadają nazwom wersji pochodnych (fotoapp/renditions.py).
+STYLES = {
+    # Podgląd w galerii: gęsta siatka watermark.png
+    "preview": TiledLayout("watermark.png", scale=0.15, opacity=0.4, spacing=75),
+    # Miniatura w koszyku: rzadsza siatka logo
+    "thumb": TiledLayout("images/logo.png", scale=0.15, opacity=0.3, spacing_ratio=0.5),
+    # Okładka: pojedyncze logo na środku
+    "cover": CenteredLayout("images/logo.png", scale=0.30),
+    # Wersja demonstracyjna z napisem
+    "demo": TextLayout("FOTOAPP DEMO"),
+}
+
+
+# ==========================================
+# RENDEROWANIE
+# ==========================================
+
+def apply(image, style):
+    """
+    Nakłada znak wodny w danym stylu i zwraca obraz RGB. Logo jest nakładane kafelek po
+    kafelku na kopię zdjęcia - bez warstwy wielkości zdjęcia (~96 MB dla 24 Mpx).
+    """
+    base = image.convert("RGBA")
+    STYLES[style].draw(base)
+    return base.convert("RGB")
+
+
+def render(source, style):
+    """Otwiera zdjęcie (ścieżka lub obiekt plikowy) i nakłada znak wodny."""
+    from PIL import Image
+
+    with Image.open(source) as image:
+        return apply(image, style)
@@ -10,8 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
-from cryptography.fernet import Fernet
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -77,10 +77,31 @@ WSGI_APPLICATION = 'kilar_fotografia.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Profil SQLite odporny na współbieżne zapisy (koszyk, tokeny galerii, upload w panelu):
+# WAL pozwala czytać podczas zapisu, busy timeout czeka na blokadę zamiast od razu zwracać
+# "database is locked", a transakcje IMMEDIATE biorą blokadę zapisu na starcie, więc nie
+# dochodzi do nieudanej próby podniesienia blokady w trakcie transakcji.
+# Porównanie z konfiguracją domyślną: python manage.py sqlite_loadtest
+# Tryb dziennika jest zapisywany w pliku bazy - ustawia go raz migrate (fotoapp/apps.py),
+# a nie każde połączenie, więc samo uruchomienie manage.py nie zmienia db.sqlite3.
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',     # w trybie WAL bezpieczne, fsync tylko przy checkpoincie
+    'busy_timeout': 20000,       # ms
+    'mmap_size': 134217728,      # 128 MB
+    'cache_size': -20000,        # ~20 MB
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ''.join(f'PRAGMA {key}={value};' for key, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        },
     }
 }
 
@@ -133,24 +154,98 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 
 
-
-ENCRYPTION_KEY ='WyFihaDs8RiDcY6lCd_lxFKI4xfJeeRx7mIqRyB1-1k='
-
-
-FERNET = Fernet(ENCRYPTION_KEY)
-
-
 TEMPLATES[0]["OPTIONS"]["context_processors"] += [
     "fotoapp.context_processors.cart_count",
 ]
 
+# Cache - fragment siatki galerii jest kluczowany wersją zawartości sesji,
+# więc wpisy nie wymagają ręcznego czyszczenia (stare wersje po prostu wygasają).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'kilar-fotografia',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
+}
+GALLERY_CACHE_TIMEOUT = 60 * 60 * 24  # sekundy
+
+# Sprzątanie plików po usunięciu zdjęć/sesji (fotoapp/cleanup.py). Przy wyłączonym trybie
+# w tle dziennik trzeba opróżniać komendą: python manage.py sweep_files
+FILE_CLEANUP_IN_BACKGROUND = True
+FILE_CLEANUP_BATCH_SIZE = 500
+
+# Profile kodowania obrazów (fotoapp/encoding.py). Dostępne klucze: format, quality,
+# progressive, optimize, subsampling (JPEG), method (WebP), speed (AVIF), strip_metadata.
+# Porównanie profili na przykładowych zdjęciach: python manage.py benchmark_encoding
+IMAGE_ENCODING_PROFILES = {
+    # format None = zgodny z rozszerzeniem wgranego pliku
+    'original': {'format': None, 'quality': 100, 'progressive': True, 'optimize': True,
+                 'subsampling': '4:4:4', 'strip_metadata': False},
+    'preview': {'format': 'JPEG', 'quality': 85, 'progressive': True, 'optimize': True,
+                'subsampling': '4:2:0', 'strip_metadata': True},
+    'preview-webp': {'format': 'WEBP', 'quality': 80, 'method': 4, 'strip_metadata': True},
+    'preview-avif': {'format': 'AVIF', 'quality': 60, 'speed': 6, 'strip_metadata': True},
+    'thumb': {'format': 'JPEG', 'quality': 80, 'progressive': True, 'optimize': True,
+              'subsampling': '4:2:0', 'strip_metadata': True},
+    'thumb-webp': {'format': 'WEBP', 'quality': 75, 'method': 4, 'strip_metadata': True},
+    'thumb-avif': {'format': 'AVIF', 'quality': 55, 'speed': 6, 'strip_metadata': True},
+    'sprite': {'format': 'JPEG', 'quality': 72, 'progressive': True, 'optimize': True,
+               'subsampling': '4:2:0', 'strip_metadata': True},
+    # Mikro-podgląd (LQIP) wstawiany w HTML galerii - najwyżej 1 KB
+    'placeholder': {'format': 'JPEG', 'quality': 40, 'optimize': True,
+                    'subsampling': '4:2:0', 'strip_metadata': True},
+}
+# Profil kodowania dla każdej wersji pochodnej i formatu wyjściowego.
+RENDITION_PROFILES = {
+    'preview': {'jpeg': 'preview', 'webp': 'preview-webp', 'avif': 'preview-avif'},
+    'thumb': {'jpeg': 'thumb', 'webp': 'thumb-webp', 'avif': 'thumb-avif'},
+}
+
+# Renderowanie miniatur na żądanie (fotoapp/admission.py): pula procesów o stałym rozmiarze
+# i ograniczona kolejka. Po jej zapełnieniu serwer odpowiada od razu 503 z Retry-After.
+# IMAGE_RENDER_WORKERS = 0 - renderowanie w wątkach zamiast osobnych procesów.
+IMAGE_RENDER_WORKERS = 2
+IMAGE_RENDER_QUEUE = 8
+IMAGE_RENDER_RETRY_AFTER = 2  # sekundy
+
+# Arkusze miniatur siatki galerii (fotoapp/sprites.py): kilka plików zamiast obrazu na kartę.
+# Budowane w tle dla bieżącej wersji zawartości sesji; do tego czasu siatka używa osobnych
+# obrazów. None = bez arkuszy. Ręcznie: python manage.py build_sprites
+GALLERY_SPRITE_SIZE = 50  # kafelków w arkuszu
+GALLERY_SPRITE_COLUMNS = 10
+GALLERY_SPRITE_MIN_PHOTOS = 20  # mniejsze galerie zostają przy osobnych obrazach
+
+# Budżety plików pochodnych (fotoapp/janitor.py): po przekroczeniu rozmiaru lub wieku
+# od ostatniego użycia usuwane są najdawniej używane pliki. Oryginały nigdy nie są ruszane.
+# None = bez limitu. Ręcznie: python manage.py enforce_storage_budgets
+DERIVED_FILE_BUDGETS = {
+    'renditions': {'max_bytes': 5 * 1024 ** 3, 'max_age_days': 180},
+    'zips': {'max_bytes': 2 * 1024 ** 3, 'max_age_days': 30},
+    'watermarked': {'max_bytes': 1024 ** 3, 'max_age_days': 90},
+    'sprites': {'max_bytes': 1024 ** 3, 'max_age_days': 90},
+}
+# Archiwa zamówień są chronione przed janitorem przez tyle dni od realizacji - link
+# z e-maila działa co najmniej tak długo (potem odtwarza je strona sukcesu)
+ORDER_DOWNLOAD_DAYS = 30
+# Co ile sekund janitor działa w wątku w tle procesu serwera (None = tylko komenda)
+DERIVED_FILE_JANITOR_INTERVAL = None
+# Dokładność zapisu czasu użycia - częstsze odsłony tego samego pliku nie piszą do bazy
+DERIVED_FILE_ACCESS_RESOLUTION = 60 * 60  # sekundy
+
 
 
 
 # demo stripe'a
 STRIPE_PUBLIC_KEY = 'pk_test_51SbkNjPEDmDYtmB9toFXHnpVkBcYN8OVMUGxMWH0erbuiMpdZyhmvZ53G4IR7sUyNOW7pTkAfMsVKilh2tj7zuSe00IxaRoOLD' # Twój klucz publiczny ze Stripe Dashboard
 STRIPE_SECRET_KEY = 'sk_test_51SbkNjPEDmDYtmB9y4gpQV0SoRfArbPvUE54ZoHdqaknDrw2ZK71C11KyxgQsXZLdDPI3O5sPIgYcSfzJzL0BpNV00ntfEgsAi' # Twój klucz prywatny ze Stripe Dashboard
+# Sekret endpointu webhooka (Dashboard -> Developers -> Webhooks, albo `stripe listen`).
+# Bez domyślnej wartości - bez sekretu webhook odpowiada 500 i niczego nie realizuje.
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+# Adres API Stripe; lokalny zamiennik: python manage.py stripe_stub (np. http://127.0.0.1:12111)
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE')
 PRICE_PER_PHOTO = 25.00  # Cena za jedno zdjęcie (PLN)
+# Po ilu sekundach niezakończoną realizację zamówienia (ZIP + e-mail) może przejąć kolejna próba
+ORDER_FULFILLMENT_LEASE = 15 * 60
 
 # Email - placeholder na potrzeby projektu
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
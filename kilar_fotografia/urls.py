@@ -12,13 +12,16 @@ urlpatterns = [
     path('kontakt/', views.kontakt, name='kontakt'),
     path('check-password/', views.check_password, name='check_password'),
     path('gallery/<str:access_token>/', views.gallery_view, name='gallery_view'),
+    path('gallery/<str:access_token>/manifest.json', views.gallery_manifest, name='gallery_manifest'),
     path('image/<str:token>/', views.serve_encrypted_image, name='serve_encrypted_image'),
     path("api/cart/add/<int:photo_id>/", views.api_cart_add, name="api_cart_add"),
     path("api/cart/remove/<int:photo_id>/", views.api_cart_remove, name="api_cart_remove"),
     path("api/cart/delete/<int:photo_id>/", views.api_cart_delete, name="api_cart_delete"),
     path("api/cart/summary/", views.api_cart_summary, name="api_cart_summary"),
+    path("api/cart/batch/", views.api_cart_batch, name="api_cart_batch"),
     path("cart/", views.cart_view, name="cart_view"),
     path('checkout/', views.create_checkout_session, name='checkout'),
     path('success/', views.payment_success, name='payment_success'),
+    path('stripe/webhook/', views.stripe_webhook, name='stripe_webhook'),
 
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file